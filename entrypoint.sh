@@ -1,4 +1,11 @@
 #!/bin/sh
-python manage.py migrate
-python manage.py loaddata data/polls-v4.json data/votes-v4.json data/users.json
-python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+set -e
+python manage.py migrate --noinput
+# Seeds an empty database only, so restarting a container is quick.
+python manage.py load_demo_data
+python manage.py poll_scheduler
+if [ "$DEV_SERVER" = "True" ]; then
+    exec python manage.py runserver 0.0.0.0:8000
+fi
+# Pre-forked workers; see mysite/gunicorn.conf.py for the WEB_* settings.
+exec gunicorn --config mysite/gunicorn.conf.py
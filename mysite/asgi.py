@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+# Serve the polls with their async views under ASGI.
+os.environ.setdefault('ROOT_URLCONF', 'mysite.async_urls')
 
 application = get_asgi_application()
@@ -0,0 +1,15 @@
+"""
+URL configuration that serves the polls through their async views.
+
+mysite/asgi.py uses it by default: set ROOT_URLCONF to choose another.
+"""
+from django.contrib import admin
+from django.urls import include, path
+from django.views.generic.base import RedirectView
+
+urlpatterns = [
+    path('', RedirectView.as_view(url='polls/')),
+    path('polls/', include('polls.async_urls')),
+    path('admin/', admin.site.urls),
+    path('accounts/', include('django.contrib.auth.urls')),
+]
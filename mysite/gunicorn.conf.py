@@ -0,0 +1,60 @@
+"""Gunicorn settings for serving the site in production.
+
+Run with ``gunicorn -c mysite/gunicorn.conf.py``. Every setting can be
+changed from the environment or the .env file.
+"""
+
+import multiprocessing
+
+# Not `from decouple import config`: gunicorn would take `config` for its
+# own setting of that name.
+import decouple
+
+# WSGI by default; set WEB_APP=mysite.asgi:application and
+# WEB_WORKER_CLASS=uvicorn_worker.UvicornWorker to serve the async views.
+wsgi_app = decouple.config('WEB_APP', default='mysite.wsgi:application')
+worker_class = decouple.config('WEB_WORKER_CLASS', default='gthread')
+
+# Results versions, vote maps, cached pages, the login throttle, rate
+# limits and cached users live in the cache, so workers must share it,
+# and count in it atomically. Only Redis and Memcached do both: the file
+# and database caches increment with a read and a write, so workers
+# lose each other's counts.
+SHARED_CACHES = {
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+}
+cache_backend = decouple.config(
+    'CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+shared_cache = cache_backend in SHARED_CACHES
+
+bind = decouple.config('WEB_BIND', default='0.0.0.0:8000')
+requested_workers = decouple.config(
+    'WEB_WORKERS',
+    default=multiprocessing.cpu_count() * 2 + 1 if shared_cache else 1,
+    cast=int)
+workers = requested_workers if shared_cache else 1
+threads = decouple.config('WEB_THREADS', default=4, cast=int)
+timeout = decouple.config('WEB_TIMEOUT', default=30, cast=int)
+
+# Import Django once in the master, so forking a worker is quick and the
+# workers share the loaded code. Database connections are only opened by
+# the workers, after the fork.
+preload_app = True
+
+# Recycle workers now and then, so a slow leak can't grow for ever.
+max_requests = decouple.config('WEB_MAX_REQUESTS', default=10_000, cast=int)
+max_requests_jitter = max_requests // 10
+
+accesslog = decouple.config('WEB_ACCESS_LOG', default='-')
+
+
+def on_starting(server):
+    """Warn when WEB_WORKERS was cut to one for want of a shared cache."""
+    if workers < requested_workers:
+        server.log.warning(
+            "%s isn't shared by processes or doesn't count atomically, so "
+            "only 1 worker is started instead of %d; set CACHE_BACKEND to "
+            "Redis or Memcached to run more.",
+            cache_backend, requested_workers)
@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config, Csv
+from decouple import config, Choices, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,7 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'polls.instrumentation.RequestStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'mysite.static.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -53,7 +55,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'mysite.urls'
+ROOT_URLCONF = config('ROOT_URLCONF', default='mysite.urls')
 
 TEMPLATES = [
     {
@@ -66,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'polls.context_processors.page_cache',
             ],
         },
     },
@@ -84,10 +87,70 @@ DATABASES = {
         "USER": config("DB_USER", default="pollsapp"),
         "PASSWORD": config("DB_PWD", default="password1234"),
         "HOST": config("DATABASE_HOST", default="db"),
-        "PORT": config("DATABASE_PORT", default="5432")
+        "PORT": config("DATABASE_PORT", default="5432"),
+        # Keep each thread's connection open for this many seconds instead
+        # of connecting on every request, checking it is still alive
+        # before reusing it.
+        "CONN_MAX_AGE": config("CONN_MAX_AGE", default=0, cast=int),
+        "CONN_HEALTH_CHECKS": config("CONN_HEALTH_CHECKS", default=True,
+                                     cast=bool),
     }
 }
 
+# Or share a pool of connections between all the threads of a process,
+# which also suits the ASGI server, whose threads don't live long enough
+# to reuse a persistent connection. Needs psycopg[pool].
+if config("DB_POOL", default=False, cast=bool):
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+            "max_size": config("DB_POOL_MAX_SIZE", default=10, cast=int),
+            "timeout": config("DB_POOL_TIMEOUT", default=10, cast=float),
+        },
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Use Redis or Memcached in production: they are shared by all workers,
+# so they see the same results snapshots, and they count rate limits
+# atomically.
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="ku-polls"),
+    }
+}
+
+# The local-memory, file and database caches delete a third of their
+# entries at random once they hold MAX_ENTRIES, 300 by default, which
+# would throw away rate-limit and sign-in counters of active clients.
+if CACHES["default"]["BACKEND"].split(".")[-2] in ("locmem", "filebased",
+                                                    "db"):
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": config("CACHE_MAX_ENTRIES", default=50_000, cast=int),
+    }
+
+
+# How long anonymous index and results pages are cached, in seconds.
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Log the SQL of any request that runs more queries than this (0 disables).
+QUERY_LOG_THRESHOLD = config('QUERY_LOG_THRESHOLD', default=30, cast=int)
+
+
+# Write-behind vote buffer: queue votes in a local SQLite file, and let
+# `python manage.py flush_votes` apply them to the database in bulk.
+
+VOTE_BUFFER = config('VOTE_BUFFER', default=False, cast=bool)
+VOTE_BUFFER_PATH = config('VOTE_BUFFER_PATH',
+                          default=str(BASE_DIR / 'vote-buffer.sqlite3'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -108,10 +171,55 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 AUTHENTICATION_BACKENDS = [
-    # username & password authentication
-   'django.contrib.auth.backends.ModelBackend',  
+    # refuses sign-ins from IPs and for usernames with too many failures,
+    # before any password is hashed
+    'polls.backends.LoginThrottleBackend',
+    # username & password authentication, with the signed-in user of each
+    # request loaded from the cache when CACHED_USERS is on
+    'polls.backends.CachedModelBackend'
+    if config('CACHED_USERS', default=False, cast=bool)
+    else 'django.contrib.auth.backends.ModelBackend',
 ]
 
+# How many reverse proxies in front of the site append to X-Forwarded-For.
+# With 0 the header is ignored and clients are told apart by the address
+# they connect from; with N the Nth address from the right is used.
+TRUSTED_PROXIES = config('TRUSTED_PROXIES', default=0, cast=int)
+
+# Failed sign-ins allowed per IP address and per username in the last
+# LOGIN_WINDOW seconds, before further attempts are refused.
+LOGIN_WINDOW = config('LOGIN_WINDOW', default=300, cast=int)
+LOGIN_FAILURES_PER_IP = config('LOGIN_FAILURES_PER_IP', default=20, cast=int)
+LOGIN_FAILURES_PER_USERNAME = config('LOGIN_FAILURES_PER_USERNAME',
+                                     default=5, cast=int)
+
+# Limits on requests to the voting views per signed-in user and per IP
+# address: "N/period" allows N requests in any period (s, m, h or d, e.g.
+# "5/10s"). An empty rate disables a limit. The per-user limit is the one
+# that matters; the per-IP one is loose because a whole campus may share
+# an address. Requests are counted in the cache.
+RATE_LIMITS = {
+    'polls:vote': {
+        'ip': config('VOTE_RATE_PER_IP', default='1000/m'),
+        'user': config('VOTE_RATE_PER_USER', default='30/m'),
+    },
+    'polls:unvote': {
+        'ip': config('UNVOTE_RATE_PER_IP', default='1000/m'),
+        'user': config('UNVOTE_RATE_PER_USER', default='30/m'),
+    },
+}
+
+# Sessions: "db" reads and writes them in the database on every request,
+# "cached_db" reads them from the cache and writes through to the
+# database, and "signed_cookies" keeps them in a signed cookie, needing
+# no storage at all.
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + config(
+    'SESSION_BACKEND', default='db',
+    cast=Choices(['db', 'cached_db', 'signed_cookies']))
+
+# Flash messages travel in a cookie rather than in the session.
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 LOGIN_REDIRECT_URL = 'polls:index'
 LOGOUT_REDIRECT_URL = 'polls:index'
 
@@ -132,11 +240,34 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# `collectstatic` gathers the static files into STATIC_ROOT, gzipped and
+# with content hashes in their names, and WhiteNoise serves them from
+# each worker, WSGI or ASGI, with far-future cache headers. Files that
+# weren't collected, e.g. in tests, keep their plain names.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'mysite.storage.StaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Requests only queue their log records; a listener thread writes them
+# to the console and, as JSON lines, to LOG_FILE. Every worker process
+# appends to that file, so it is never rotated from here: rotate it with
+# logrotate (or similar), and each process reopens it once it is moved.
+# With LOG_FILE empty the JSON lines go to standard output instead, and
+# nothing to the console, for a container runtime to collect and rotate.
+LOG_FILE = config('LOG_FILE', default='polls.log')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -149,23 +280,36 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'polls.logging_pipeline.JsonFormatter',
+        },
     },
     'handlers': {
-        'file': {
+        'json': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': 'polls.log',
-            'formatter': 'details',
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': LOG_FILE,
+            'formatter': 'json',
+        } if LOG_FILE else {
+            'level': 'DEBUG',
+            'class': 'logging.StreamHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': 'json',
         },
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
             'formatter': 'details',
         },
+        'queue': {
+            '()': 'polls.logging_pipeline.QueuedHandler',
+            'handlers': ['json', 'console'] if LOG_FILE else ['json'],
+            'maxsize': config('LOG_QUEUE_SIZE', default=10_000, cast=int),
+        },
     },
     'loggers': {
         'polls': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'DEBUG',
             'propagate': True,
         },
@@ -0,0 +1,41 @@
+"""Serve the site's static files from the workers, sync or async."""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, \
+    sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise, without adapting the async handler to sync.
+
+    WhiteNoise's middleware is sync only, so under ASGI Django would run
+    every request, static or not, through a thread. Here, other requests
+    are passed on as they are: only a static file is served from a
+    thread, which opens it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        """Index the static files, and go async with `get_response`."""
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Serve a static file, or pass the request on."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        """Serve a static file, or pass the request on, asynchronously."""
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(
+                request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
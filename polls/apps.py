@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class PollsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        """Connect the receivers that must be in place from the start.
+
+        Queries are counted on every connection, including the first one,
+        and cached users are dropped as soon as any of them changes.
+        """
+        from . import backends, instrumentation  # noqa: F401
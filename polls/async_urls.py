@@ -0,0 +1,22 @@
+"""URLs of the poll application, served by its async views."""
+
+from django.urls import path
+
+from . import async_views, views
+
+app_name = "polls"
+urlpatterns = [
+    path("", async_views.IndexView.as_view(), name="index"),
+    path("<int:pk>/", async_views.DetailView.as_view(), name="detail"),
+    path("<int:pk>/results/", async_views.ResultsView.as_view(),
+         name="results"),
+    path("<int:pk>/results/live/", async_views.live_results,
+         name="live_results"),
+    path("<int:question_id>/vote/", async_views.vote, name="vote"),
+    path("<int:question_id>/unvote/", async_views.unvote, name="unvote"),
+    path("<int:question_id>/export/", async_views.export_poll,
+         name="export"),
+    path("import/", views.import_votes, name="import"),
+    path("stats/", views.stats, name="stats"),
+    path("metrics/", views.metrics, name="metrics"),
+]
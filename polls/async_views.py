@@ -0,0 +1,241 @@
+"""Async versions of the poll application's pages and voting views.
+
+These serve the same templates as `polls.views` but query the database
+with Django's async ORM, so an ASGI server doesn't push every request
+through a thread. Writes still run in a thread, as transactions need a
+synchronous connection.
+"""
+
+import functools
+import logging
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required
+from django.db.models import Q
+from django.http import HttpResponseBadRequest, HttpResponseRedirect, \
+    StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render
+from django.urls import reverse
+from django.views import View
+
+from . import export, lifecycle, live, page_cache, user_votes
+from .buffer import get_buffer
+from .instrumentation import rendering
+from .models import Choice, Question, Vote
+from .ratelimit import rate_limited
+from .results import acached_tally
+from .views import IndexView as SyncIndexView, make_cursor, parse_cursor
+from .voting import cast_vote, retract_vote
+
+logger = logging.getLogger("polls")
+
+
+class IndexView(View):
+    """The view of the poll's index page."""
+
+    page_size = SyncIndexView.page_size
+
+    async def get(self, request):
+        """Show a page of published questions, the newest first.
+
+        Anonymous visitors are served the cached page, if there is one.
+        """
+        request.user = await request.auser()
+        await lifecycle.atick()
+        cursor = request.GET.get("before")
+        page_key = await page_cache.aindex_key(cursor)
+        render_page = functools.partial(self.render_page, request, cursor,
+                                        page_key)
+        if await sync_to_async(page_cache.cacheable)(request):
+            return await page_cache.aserve(request, page_key, render_page)
+        return await render_page()
+
+    async def render_page(self, request, cursor, page_key):
+        """Render the page of questions after `cursor`."""
+        questions = Question.objects.published()
+        if cursor:
+            pub_date, pk = parse_cursor(cursor)
+            questions = questions.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+        page = [question async for question
+                in questions[:self.page_size + 1]]
+        next_cursor = None
+        if len(page) > self.page_size:
+            next_cursor = make_cursor(page[self.page_size - 1])
+        page = page[:self.page_size]
+        votes = await user_votes.avote_map(request.user, get_buffer())
+        voted = []
+        for question in page:
+            question.voted = question.id in votes
+            if question.voted:
+                voted.append(str(question.id))
+        with rendering():
+            return render(request, "polls/index.html", {
+                "latest_question_list": page,
+                "next_cursor": next_cursor,
+                "is_first_page": cursor is None,
+                "fragment_key": f"{page_key}:{','.join(voted)}",
+            })
+
+
+class DetailView(View):
+    """Display choices for a poll."""
+
+    async def get(self, request, pk):
+        """Show the question's choices, marking the user's current vote.
+
+        Redirects to the index page when the question can't be voted on.
+        """
+        user = request.user = await request.auser()
+        await lifecycle.atick()
+        question = await aget_object_or_404(
+            Question.objects.prefetch_related("choice_set"), pk=pk)
+        if question.status != Question.Status.OPEN:
+            messages.error(request, "Access Denied.")
+            return HttpResponseRedirect(reverse("polls:index"))
+        context = {"question": question}
+        votes = await user_votes.avote_map(user, get_buffer())
+        marked_choice_id = votes.get(question.id)
+        for choice in question.choice_set.all():
+            if choice.id == marked_choice_id:
+                context["marked_choice"] = choice
+        with rendering():
+            return render(request, "polls/detail.html", context)
+
+
+class ResultsView(View):
+    """The view of the results page."""
+
+    async def get(self, request, pk):
+        """Show the vote totals of the question's choices.
+
+        Anonymous visitors are served the cached page, if there is one.
+        """
+        request.user = await request.auser()
+        page_key = await page_cache.aresults_key(pk)
+        render_page = functools.partial(self.render_page, request, pk,
+                                        page_key)
+        if await sync_to_async(page_cache.cacheable)(request):
+            return await page_cache.aserve(request, page_key, render_page)
+        return await render_page()
+
+    async def render_page(self, request, pk, page_key):
+        """Render the results page of a question."""
+        question = await aget_object_or_404(Question, pk=pk)
+        context = {
+            "question": question,
+            "results": await acached_tally(question.pk),
+            "fragment_key": page_key,
+        }
+        if question.status == Question.Status.OPEN:
+            # Only running polls get new votes to push.
+            context["live_url"] = reverse("polls:live_results", args=(pk,))
+        with rendering():
+            return render(request, "polls/results.html", context)
+
+
+async def live_results(request, pk):
+    """Stream the question's results as server-sent events."""
+    question = await aget_object_or_404(Question, pk=pk)
+    response = StreamingHttpResponse(live.stream(question.pk),
+                                     content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@rate_limited("polls:vote")
+@login_required
+async def vote(request, question_id):
+    """If the user is eligible to vote, cast a vote to the active question."""
+    question = await aget_object_or_404(Question, pk=question_id)
+    try:
+        selected_choice = await question.choice_set.aget(
+            pk=request.POST["choice"])
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        logger.error(
+            f"Failed to get selected choice for question {question_id}"
+        )
+        messages.error(request, "Please re-select the choice again.")
+        return HttpResponseRedirect(reverse("polls:detail",
+                                            args=(question.id,)))
+
+    this_user = await request.auser()
+    vote_buffer = get_buffer()
+    cast = vote_buffer.cast if vote_buffer else cast_vote
+    previous = await sync_to_async(cast)(this_user, selected_choice)
+    if previous is not None:
+        logger.info(
+            f"{this_user} changed vote to vote id: {selected_choice.id} \
+on question id: {question.id}",
+            extra={"event": "vote", "user": this_user.pk,
+                   "question": question.id, "choice": selected_choice.id},
+        )
+        messages.success(request, f'Your vote was changed to \
+"{selected_choice.choice_text}"')
+    else:
+        logger.info(
+            f"{this_user} voted vote id: {selected_choice.id} \
+on question id: {question.id}",
+            extra={"event": "vote", "user": this_user.pk,
+                   "question": question.id, "choice": selected_choice.id},
+        )
+        messages.success(request, f'You have voted \
+"{selected_choice.choice_text}"')
+    return HttpResponseRedirect(reverse("polls:results", args=(question.id,)))
+
+
+@rate_limited("polls:unvote")
+@login_required
+async def unvote(request, question_id):
+    """Delete the user's vote, if exists."""
+    question = await aget_object_or_404(Question, pk=question_id)
+    this_user = await request.auser()
+    vote_buffer = get_buffer()
+    retract = vote_buffer.retract if vote_buffer else retract_vote
+    try:
+        vote = await sync_to_async(retract)(this_user, question)
+    except Vote.DoesNotExist:
+        messages.error(request, "ERROR: You haven't vote yet")
+        logger.error(
+            f"{this_user} tried to delete non-existent vote \
+on question id: {question.id}"
+        )
+        return HttpResponseRedirect(reverse("polls:detail",
+                                            args=(question.id,)))
+    if vote_buffer:
+        logger.info(f"{this_user} queued deleting vote \
+on question id: {question.id}",
+                    extra={"event": "unvote", "user": this_user.pk,
+                           "question": question.id})
+    else:
+        logger.info(f"{this_user} deleted vote id: {vote.id} \
+on question id: {question.id}",
+                    extra={"event": "unvote", "user": this_user.pk,
+                           "question": question.id})
+    messages.success(request, "You've successfully deleted your vote")
+    return HttpResponseRedirect(reverse("polls:results",
+                                        args=(question.id,)))
+
+
+@staff_member_required
+async def export_poll(request, question_id):
+    """Stream a question's results or raw votes as CSV or NDJSON.
+
+    Takes the same query parameters as `polls.views.export_poll`.
+    """
+    question = await aget_object_or_404(Question, pk=question_id)
+    kind = request.GET.get("kind", "results")
+    fmt = request.GET.get("format", "csv")
+    try:
+        lines = export.aexport(question, kind, fmt)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(lines,
+                                     content_type=export.FORMATS[fmt])
+    response["Content-Disposition"] = (
+        f'attachment; filename="question-{question.id}-{kind}.{fmt}"'
+    )
+    return response
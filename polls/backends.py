@@ -0,0 +1,72 @@
+"""Authentication backends of the poll application."""
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .ratelimit import login_throttled
+
+# How long a signed-in user may be served from the cache, in seconds.
+USER_CACHE_TIMEOUT = 5 * 60
+
+
+def _key(user_id):
+    return f"polls:user:{user_id}"
+
+
+class CachedModelBackend(ModelBackend):
+    """Load the signed-in user of each request from the cache.
+
+    Saves the `auth_user` query AuthenticationMiddleware makes on every
+    request. A saved or deleted user is dropped from the cache, so a
+    changed password or deactivation takes effect at once.
+    """
+
+    def get_user(self, user_id):
+        """Return the active user with this id, from the cache if there."""
+        user = cache.get(_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(_key(user_id), user, timeout=USER_CACHE_TIMEOUT)
+        return user
+
+    async def aget_user(self, user_id):
+        """Do `get_user(user_id)` with the async cache API."""
+        user = await cache.aget(_key(user_id))
+        if user is None:
+            user = await sync_to_async(super().get_user)(user_id)
+            if user is not None:
+                await cache.aset(_key(user_id), user,
+                                 timeout=USER_CACHE_TIMEOUT)
+        return user
+
+
+class LoginThrottleBackend:
+    """Refuse sign-ins from IPs and for usernames with too many failures.
+
+    Listed first in AUTHENTICATION_BACKENDS, it stops `authenticate()`
+    before the backends after it hash the password; otherwise it leaves
+    the attempt to them. It signs nobody in, so it has no `get_user()`.
+    """
+
+    def authenticate(self, request, username=None, **credentials):
+        """Raise PermissionDenied if the attempt is throttled."""
+        if login_throttled(request, username):
+            raise PermissionDenied
+        return None
+
+
+def forget(user_ids):
+    """Drop some users from the cache."""
+    cache.delete_many([_key(user_id) for user_id in user_ids])
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    """Drop a changed user from the cache."""
+    forget([instance.pk])
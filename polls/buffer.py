@@ -0,0 +1,266 @@
+"""Write-behind buffering of votes.
+
+When `settings.VOTE_BUFFER` is on, the vote and unvote views append the
+user's intent to a local SQLite file instead of writing to the main
+database. `manage.py flush_votes` then applies the intents in bulk,
+keeping only the last intent of each user on each question. The file
+uses SQLite's write-ahead log, so every web process on the host can
+append to it while the flusher reads it.
+
+Until an intent is flushed, the views read it back for the user who
+made it, so users always see their own vote. An intent the database
+rejects, e.g. for a choice or user deleted since, is moved to a
+dead-letter table instead of holding up the intents queued after it.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import IntegrityError
+
+from .models import Vote
+from .user_votes import forget
+from .voting import apply_votes
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS intents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    choice_id INTEGER,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS intents_user ON intents (user_id, question_id);
+CREATE TABLE IF NOT EXISTS dead_intents (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    choice_id INTEGER,
+    created REAL NOT NULL,
+    error TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS flush_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Counters of the flushes, shared by every process using the buffer.
+FLUSH_STATS = ["flushes", "flushed", "applied", "dead", "flush_micros"]
+
+
+class VoteBuffer:
+    """A durable, append-only queue of vote intents.
+
+    An intent is (user id, question id, choice id), where a choice id of
+    None means the user retracted their vote.
+    """
+
+    def __init__(self, path):
+        """Use the SQLite file at `path`, creating it if needed."""
+        self.path = path
+        self._local = threading.local()
+        self._stats = Counter()
+
+    @property
+    def connection(self):
+        """Return this thread's connection to the buffer file."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30,
+                                         isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # NORMAL would only sync the log at checkpoints, so a power
+            # loss could drop intents the views already acknowledged.
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def append(self, user_id, question_id, choice_id):
+        """Queue a vote intent; it is durable once this returns."""
+        started = time.perf_counter()
+        self.connection.execute(
+            "INSERT INTO intents (user_id, question_id, choice_id, created)"
+            " VALUES (?, ?, ?, ?)",
+            (user_id, question_id, choice_id, time.time()),
+        )
+        self._stats["appended"] += 1
+        self._stats["append_seconds"] += time.perf_counter() - started
+
+    def pending(self, user_id, question_id=None):
+        """Return the user's unflushed intents.
+
+        Returns:
+            a dict mapping question ids to the latest intended choice id,
+            which is None for a retracted vote.
+        """
+        query = ("SELECT question_id, choice_id FROM intents"
+                 " WHERE user_id = ?")
+        params = [user_id]
+        if question_id is not None:
+            query += " AND question_id = ?"
+            params.append(question_id)
+        rows = self.connection.execute(query + " ORDER BY id", params)
+        return dict(rows)
+
+    def current_choice(self, user, question_id):
+        """Return the id of the choice the user now votes for, or None."""
+        pending = self.pending(user.id, question_id)
+        if question_id in pending:
+            return pending[question_id]
+        return Vote.objects.filter(user=user, question_id=question_id) \
+            .values_list("choice_id", flat=True).first()
+
+    def cast(self, user, choice):
+        """Queue the user's vote for a choice.
+
+        Returns:
+            the id of the choice the user voted for before, or None.
+        """
+        previous = self.current_choice(user, choice.question_id)
+        self.append(user.id, choice.question_id, choice.id)
+        forget([user.id])
+        return previous
+
+    def retract(self, user, question):
+        """Queue the deletion of the user's vote on a question.
+
+        Returns:
+            the id of the choice the vote was for.
+
+        Raises:
+            Vote.DoesNotExist: if the user hasn't voted on the question.
+        """
+        previous = self.current_choice(user, question.id)
+        if previous is None:
+            raise Vote.DoesNotExist("The user hasn't voted on this question.")
+        self.append(user.id, question.id, None)
+        forget([user.id])
+        return previous
+
+    def flush(self, limit=10_000):
+        """Apply up to `limit` queued intents to the database.
+
+        Intents are coalesced per (user, question), keeping the last one,
+        and applied in one transaction. If the database rejects that,
+        they are applied one by one, and those it rejects again are moved
+        to the dead letters. Either way the batch leaves the queue once
+        the database has committed it.
+
+        Returns:
+            the number of intents that were flushed.
+        """
+        rows = self.connection.execute(
+            "SELECT id, user_id, question_id, choice_id, created"
+            " FROM intents ORDER BY id LIMIT ?", (limit,)
+        ).fetchall()
+        if not rows:
+            return 0
+        started = time.perf_counter()
+        latest = {}
+        for row in rows:
+            latest[row[1], row[2]] = row
+        try:
+            self._apply(latest.values())
+            dead = []
+        except IntegrityError:
+            dead = self._apply_each(latest.values())
+        micros = round((time.perf_counter() - started) * 1e6)
+        counts = {"flushes": 1, "flushed": len(rows),
+                  "applied": len(latest) - len(dead), "dead": len(dead),
+                  "flush_micros": micros}
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO dead_intents"
+                " (id, user_id, question_id, choice_id, created, error)"
+                " VALUES (?, ?, ?, ?, ?, ?)", dead)
+            connection.execute("DELETE FROM intents WHERE id <= ?",
+                               (rows[-1][0],))
+            connection.executemany(
+                "INSERT INTO flush_stats (name, value) VALUES (?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET value = value + ?",
+                [(name, count, count) for name, count in counts.items()])
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        # Their vote maps still show the rejected intents.
+        forget({intent[1] for intent in dead})
+        return len(rows)
+
+    def _apply(self, intents):
+        """Write (id, user, question, choice, created) intents at once."""
+        ballots, retractions = {}, []
+        for _, user_id, question_id, choice_id, _ in intents:
+            if choice_id is None:
+                retractions.append((user_id, question_id))
+            else:
+                ballots[user_id, question_id] = choice_id
+        apply_votes(ballots, retractions)
+
+    def _apply_each(self, intents):
+        """Write intents one at a time, returning the rejected ones.
+
+        Each rejected intent is returned with the database's error.
+        """
+        dead = []
+        for intent in intents:
+            try:
+                self._apply([intent])
+            except IntegrityError as error:
+                dead.append((*intent, str(error)))
+        return dead
+
+    def dead_letters(self):
+        """Return the intents the database rejected, oldest first.
+
+        Returns:
+            (user id, question id, choice id, error) tuples.
+        """
+        return self.connection.execute(
+            "SELECT user_id, question_id, choice_id, error"
+            " FROM dead_intents ORDER BY id").fetchall()
+
+    def backlog(self):
+        """Return the number of intents waiting to be flushed."""
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM intents").fetchone()[0]
+
+    def stats(self):
+        """Return the buffer's counters and throughput.
+
+        The append counters are this process's; the flush counters are
+        kept in the buffer file, so every process reports all flushes.
+        """
+        stats = self._stats
+        flushed = dict.fromkeys(FLUSH_STATS, 0)
+        flushed.update(self.connection.execute(
+            "SELECT name, value FROM flush_stats"))
+        seconds = flushed.pop("flush_micros") / 1e6
+        return {
+            "appended": stats["appended"],
+            **flushed,
+            "appends_per_sec": round(
+                stats["appended"] / stats["append_seconds"]
+                if stats["append_seconds"] else 0.0),
+            "flushed_per_sec": round(
+                flushed["flushed"] / seconds if seconds else 0.0),
+        }
+
+
+_buffers = {}
+
+
+def get_buffer():
+    """Return the vote buffer, or None when votes are written directly."""
+    if not settings.VOTE_BUFFER:
+        return None
+    path = str(settings.VOTE_BUFFER_PATH)
+    if path not in _buffers:
+        _buffers[path] = VoteBuffer(path)
+    return _buffers[path]
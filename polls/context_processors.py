@@ -0,0 +1,11 @@
+"""Template context shared by the poll pages."""
+
+from django.conf import settings
+
+
+def page_cache(request):
+    """Expose how long page fragments may be cached, in seconds.
+
+    The fragment caches of the templates then expire with the page cache.
+    """
+    return {"page_cache_timeout": settings.PAGE_CACHE_TIMEOUT}
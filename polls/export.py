@@ -0,0 +1,133 @@
+"""Stream the results and raw votes of a poll as CSV or NDJSON."""
+
+import csv
+import itertools
+import json
+from asgiref.sync import sync_to_async
+
+from .models import Choice, Vote
+
+# Content types of the export formats.
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# How many rows each database round trip fetches.
+CHUNK_SIZE = 2000
+
+
+def results_rows(question):
+    """Return the field names and a query of a question's results."""
+    fields = ["question_id", "question_text", "choice_id", "choice_text",
+              "votes"]
+    choices = Choice.objects.filter(question=question).order_by("pk") \
+        .values_list("question_id", "question__question_text", "pk",
+                     "choice_text", "votes")
+    return fields, choices
+
+
+def vote_rows(question):
+    """Return the field names and a query of every vote on a question."""
+    fields = ["vote_id", "question_id", "choice_id", "user_id", "username"]
+    votes = Vote.objects.filter(question=question).order_by("pk") \
+        .values_list("pk", "question_id", "choice_id", "user_id",
+                     "user__username")
+    return fields, votes
+
+
+KINDS = {
+    "results": results_rows,
+    "votes": vote_rows,
+}
+
+
+class _Line:
+    """A file-like object whose write() returns what was written."""
+
+    def write(self, value):
+        return value
+
+
+def formatter(fields, fmt):
+    """Return the header line, or None, and a function formatting a row.
+
+    Args:
+        fields: the names of the columns
+        fmt: "csv" or "ndjson"
+    """
+    if fmt == "csv":
+        writer = csv.writer(_Line())
+        return writer.writerow(fields), writer.writerow
+    return None, lambda row: json.dumps(dict(zip(fields, row))) + "\n"
+
+
+def render(fields, rows, fmt):
+    """Yield the export one line at a time, so memory use stays flat.
+
+    Args:
+        fields: the names of the columns
+        rows: an iterable of tuples
+        fmt: "csv" or "ndjson"
+    """
+    header, line = formatter(fields, fmt)
+    if header is not None:
+        yield header
+    for row in rows:
+        yield line(row)
+
+
+async def arender(fields, rows, fmt):
+    """Do `render(fields, rows, fmt)` from an async iterable of rows."""
+    header, line = formatter(fields, fmt)
+    if header is not None:
+        yield header
+    async for row in rows:
+        yield line(row)
+
+
+async def _aiterate(query):
+    """Yield a query's rows in async code, fetching a chunk per thread hop.
+
+    QuerySet.aiterator() would run a values_list() query's first fetch in
+    the event loop, which Django refuses.
+    """
+    rows = query.iterator(chunk_size=CHUNK_SIZE)
+    fetch = sync_to_async(lambda: list(itertools.islice(rows, CHUNK_SIZE)))
+    while chunk := await fetch():
+        for row in chunk:
+            yield row
+
+
+def _query(kind, fmt, question):
+    """Return the field names and query of an export.
+
+    Raises:
+        ValueError: if the kind or format is unknown.
+    """
+    if kind not in KINDS or fmt not in FORMATS:
+        raise ValueError(f"Can't export {kind!r} as {fmt!r}.")
+    return KINDS[kind](question)
+
+
+def export(question, kind, fmt):
+    """Yield the lines of a question's `kind` export in format `fmt`.
+
+    Raises:
+        ValueError: if the kind or format is unknown.
+    """
+    fields, rows = _query(kind, fmt, question)
+    return render(fields, rows.iterator(chunk_size=CHUNK_SIZE), fmt)
+
+
+def aexport(question, kind, fmt):
+    """Return `export(question, kind, fmt)` as an async iterator.
+
+    Rows are fetched a chunk at a time, so an ASGI server streams the
+    export without loading it into memory.
+
+    Raises:
+        ValueError: if the kind or format is unknown.
+    """
+    fields, rows = _query(kind, fmt, question)
+    return arender(fields, _aiterate(rows), fmt)
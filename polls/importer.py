@@ -0,0 +1,119 @@
+"""Import votes in bulk, e.g. from offline or paper ballots."""
+
+import csv
+import json
+import time
+from django.contrib.auth.models import User
+
+from .models import Choice
+from .voting import apply_votes
+
+FIELDS = ("username", "question_id", "choice_id")
+
+
+def parse_ballots(lines, fmt):
+    """Yield (line number, record) pairs from CSV or NDJSON lines.
+
+    A record is a dict with a username, question_id and choice_id, or
+    None when the line can't be read. CSV input starts with a header.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+class VoteImporter:
+    """Validate and apply ballots in batches.
+
+    Usernames and choices are looked up once per batch for the records
+    that haven't been seen before, and the maps are kept across batches.
+    """
+
+    def __init__(self, batch_size=1000):
+        """Create an importer that applies `batch_size` records at a time."""
+        self.batch_size = batch_size
+        self.user_ids = {}
+        self.choice_questions = {}
+        self.imported = 0
+        self.rejected = []
+
+    def run(self, records, on_batch=None):
+        """Import numbered records, calling `on_batch` after each batch.
+
+        Returns:
+            the number of votes written.
+        """
+        batch = []
+        for number, record in records:
+            batch.append((number, record))
+            if len(batch) == self.batch_size:
+                self.apply(batch, on_batch)
+                batch = []
+        if batch:
+            self.apply(batch, on_batch)
+        return self.imported
+
+    def apply(self, batch, on_batch):
+        """Validate one batch and write it in a single transaction."""
+        started = time.perf_counter()
+        rejected_before = len(self.rejected)
+        ballots = self.validate(batch)
+        apply_votes(ballots)
+        self.imported += len(ballots)
+        if on_batch:
+            on_batch({
+                "votes": len(ballots),
+                "rejected": len(self.rejected) - rejected_before,
+                "seconds": time.perf_counter() - started,
+            })
+
+    def validate(self, batch):
+        """Return the valid ballots of a batch, rejecting the others.
+
+        Returns:
+            a dict mapping (user id, question id) to a choice id. When a
+            user has several ballots for a question, the last one wins.
+        """
+        records = []
+        for number, record in batch:
+            try:
+                username = str(record["username"])
+                question_id = int(record["question_id"])
+                choice_id = int(record["choice_id"])
+            except (KeyError, TypeError, ValueError):
+                self.rejected.append((number, "malformed record"))
+            else:
+                records.append((number, username, question_id, choice_id))
+        self.load(records)
+        ballots = {}
+        for number, username, question_id, choice_id in records:
+            if username not in self.user_ids:
+                self.rejected.append((number, f"no user {username!r}"))
+            elif self.choice_questions.get(choice_id) != question_id:
+                self.rejected.append(
+                    (number, f"no choice {choice_id} in question "
+                             f"{question_id}"))
+            else:
+                user_id = self.user_ids[username]
+                ballots[user_id, question_id] = choice_id
+        return ballots
+
+    def load(self, records):
+        """Look up the users and choices not seen in earlier batches."""
+        usernames = {username for _, username, _, _ in records} \
+            - self.user_ids.keys()
+        self.user_ids.update(User.objects.filter(username__in=usernames)
+                             .values_list("username", "pk"))
+        choice_ids = {choice for _, _, _, choice in records} \
+            - self.choice_questions.keys()
+        self.choice_questions.update(Choice.objects.filter(pk__in=choice_ids)
+                                     .values_list("pk", "question_id"))
@@ -0,0 +1,255 @@
+"""Per-view query and latency instrumentation.
+
+`RequestStatsMiddleware` records, for every view, the number of queries
+a request ran, the time spent in the database, the time spent rendering
+templates, the total time and the response size. The figures go into
+in-memory histograms, which are kept per process. Render time is only
+recorded for responses that rendered a template: template responses,
+and templates rendered by views inside `rendering()`; a page served
+from the page cache has none.
+
+Queries are counted by a wrapper installed on every database connection.
+The wrapper reports to the request being served through a context
+variable, so queries run in `sync_to_async` threads by async views are
+counted too.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger("polls")
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+                   2.5, 5)
+BYTES_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 500_000,
+                 1_000_000)
+
+METRICS = {
+    "queries": QUERY_BUCKETS,
+    "db_seconds": SECONDS_BUCKETS,
+    "render_seconds": SECONDS_BUCKETS,
+    "total_seconds": SECONDS_BUCKETS,
+    "response_bytes": BYTES_BUCKETS,
+}
+
+
+class Histogram:
+    """Count observations into fixed buckets, Prometheus style."""
+
+    def __init__(self, buckets):
+        """Create an empty histogram with the given upper bounds."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        """Add one observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Return (upper bound, observations up to it) pairs."""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class Registry:
+    """The histograms of every view, keyed by view name."""
+
+    def __init__(self):
+        """Create an empty registry."""
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, **values):
+        """Record one request's figures for a view."""
+        with self._lock:
+            histograms = self._views.setdefault(view_name, {
+                name: Histogram(buckets) for name, buckets in METRICS.items()
+            })
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def clear(self):
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._views.clear()
+
+    def snapshot(self):
+        """Return the histograms as plain data."""
+        with self._lock:
+            return {
+                view: {
+                    name: {
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "mean": (histogram.sum / histogram.count
+                                 if histogram.count else 0),
+                        "buckets": {str(bound): count for bound, count
+                                    in histogram.cumulative()},
+                    }
+                    for name, histogram in histograms.items()
+                }
+                for view, histograms in sorted(self._views.items())
+            }
+
+    def prometheus(self):
+        """Return the histograms in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for name in METRICS:
+                metric = f"polls_request_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for view, histograms in sorted(self._views.items()):
+                    histogram = histograms[name]
+                    label = f'view="{view}"'
+                    for bound, count in histogram.cumulative():
+                        lines.append(
+                            f'{metric}_bucket{{{label},le="{bound}"}} {count}'
+                        )
+                    lines.append(f"{metric}_sum{{{label}}} {histogram.sum}")
+                    lines.append(
+                        f"{metric}_count{{{label}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+_current = contextvars.ContextVar("polls_request_stats", default=None)
+
+
+class _RequestStats:
+    """What one request did in the database and the template engine."""
+
+    def __init__(self):
+        """Start the clock on a request."""
+        self.started = time.perf_counter()
+        self.queries = []
+        self.db_seconds = 0.0
+        self.render_seconds = None
+
+    def add_render(self, seconds):
+        """Count time spent rendering templates."""
+        self.render_seconds = (self.render_seconds or 0.0) + seconds
+
+
+def _record_query(execute, sql, params, many, context):
+    """Time a query for the request being served, if any."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_seconds += time.perf_counter() - started
+        stats.queries.append(sql)
+
+
+def install(connection, **kwargs):
+    """Add the query recorder to a database connection."""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install)
+
+
+@contextlib.contextmanager
+def rendering():
+    """Count the time spent in the block as the request's render time."""
+    stats = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.add_render(time.perf_counter() - started)
+
+
+class RequestStatsMiddleware:
+    """Record the queries, timings and size of every response."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Install the query recorder on the connections opened so far."""
+        self.get_response = get_response
+        self.threshold = getattr(settings, "QUERY_LOG_THRESHOLD", None)
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Serve the request, recording what it cost."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = _RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        """Serve the request asynchronously, recording what it cost."""
+        stats = _RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats)
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the rendering of template responses."""
+        stats = _current.get()
+        if stats is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                stats.add_render(time.perf_counter() - started)
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, stats):
+        """Add a finished request to its view's histograms."""
+        match = request.resolver_match
+        if match is None:
+            return
+        values = {
+            "queries": len(stats.queries),
+            "db_seconds": stats.db_seconds,
+            "total_seconds": time.perf_counter() - stats.started,
+        }
+        if stats.render_seconds is not None:
+            values["render_seconds"] = stats.render_seconds
+        if not response.streaming:
+            values["response_bytes"] = len(response.content)
+        registry.record(match.view_name, **values)
+        if self.threshold and len(stats.queries) > self.threshold:
+            logger.warning(
+                f"{match.view_name} ran {len(stats.queries)} queries "
+                f"for {request.path}:\n" + "\n".join(stats.queries)
+            )
@@ -0,0 +1,89 @@
+"""Advance questions through their lifecycle as their dates pass.
+
+A question is scheduled until its `pub_date`, open until its `end_date`
+and closed after it. The status is materialized in `Question.status` so
+pages can filter and cache on it. `advance()` moves every question whose
+boundary has passed, invalidates the cached pages when anything moved,
+and remembers when the next boundary is due.
+
+`tick()` is cheap enough to call on every request: it only reads the
+time of the next boundary from the cache, and advances once it's due.
+That time is never more than `RECHECK` ahead, so dates written without
+`Question.save()`, such as by `bulk_create()`, `update()` or another
+process, are picked up within `RECHECK` too.
+`manage.py poll_scheduler --watch` does the same from a worker that
+sleeps until each boundary.
+"""
+
+import datetime
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Question
+from .page_cache import bump_content_version
+
+_NEXT_KEY = "polls:lifecycle:next"
+
+# The longest the questions go without being checked for a passed date.
+RECHECK = datetime.timedelta(seconds=60)
+
+# Stored as the next boundary when no question has one coming.
+_NEVER = datetime.datetime.max.replace(tzinfo=datetime.timezone.utc)
+
+
+def next_transition():
+    """Return when the next question opens or closes, or None."""
+    Status = Question.Status
+    boundaries = Question.objects.aggregate(
+        opens=Min("pub_date", filter=Q(status=Status.SCHEDULED)),
+        closes=Min("end_date", filter=Q(status=Status.OPEN)),
+    )
+    return min(filter(None, boundaries.values()), default=None)
+
+
+def advance(now=None):
+    """Move the questions whose boundaries have passed to their status.
+
+    Returns:
+        the number of questions that changed status.
+    """
+    Status = Question.Status
+    now = now or timezone.now()
+    published = Question.objects.filter(status=Status.SCHEDULED,
+                                        pub_date__lte=now)
+    moved = published.filter(Q(end_date__isnull=True)
+                             | Q(end_date__gte=now)).update(status=Status.OPEN)
+    moved += Question.objects.exclude(status=Status.CLOSED) \
+        .filter(pub_date__lte=now, end_date__lt=now) \
+        .update(status=Status.CLOSED)
+    if moved:
+        bump_content_version()
+    due = min(next_transition() or _NEVER, now + RECHECK)
+    cache.set(_NEXT_KEY, due, timeout=RECHECK.total_seconds())
+    return moved
+
+
+def tick(now=None):
+    """Advance the questions if a boundary is due; usually no queries."""
+    now = now or timezone.now()
+    due = cache.get(_NEXT_KEY)
+    if due is None or due <= now:
+        advance(now)
+
+
+async def atick(now=None):
+    """Do `tick(now)` from async code."""
+    now = now or timezone.now()
+    due = await cache.aget(_NEXT_KEY)
+    if due is None or due <= now:
+        await sync_to_async(advance)(now)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def dates_changed(sender, **kwargs):
+    """Forget the next boundary, as the question's dates may move it."""
+    cache.delete(_NEXT_KEY)
@@ -0,0 +1,66 @@
+"""Stream live poll results as server-sent events.
+
+Streams are only served by the async views under ASGI, where an open
+stream costs a coroutine rather than a worker thread. A stream notices
+new votes by polling the question's results version in the cache, which
+every server process bumps once its vote is committed, so with a shared
+cache it hears about votes handled by any process.
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+from .results import acached_tally, aget_version
+
+# Streams check for new votes once per this many seconds, so watchers get
+# at most one update per interval.
+COALESCE_INTERVAL = 1.0
+
+# Idle streams send a comment this often, so proxies keep them open.
+HEARTBEAT = 15.0
+
+
+def event(results):
+    """Format results as a server-sent event."""
+    return f"event: results\ndata: {json.dumps(results)}\n\n"
+
+
+async def release_connections():
+    """Give back the database connections of the request's sync thread.
+
+    A stream lasts as long as its page is open, so it mustn't hold on to
+    a connection between updates.
+    """
+    await sync_to_async(connections.close_all)()
+
+
+async def stream(question_id, interval=COALESCE_INTERVAL,
+                 heartbeat=HEARTBEAT):
+    """Yield server-sent events with a question's latest results.
+
+    The first event carries the current results. Afterwards the results
+    version is checked once per `interval`, a single cache read, and one
+    event is sent when it changed. Results are read through the results
+    cache, so however many streams watch a question, a change costs a
+    single database read.
+    """
+    seen = await aget_version(question_id)
+    yield event(await acached_tally(question_id))
+    await release_connections()
+    idle = 0.0
+    while True:
+        await asyncio.sleep(interval)
+        version = await aget_version(question_id)
+        if version != seen:
+            seen = version
+            yield event(await acached_tally(question_id))
+            await release_connections()
+            idle = 0.0
+        else:
+            idle += interval
+            if idle >= heartbeat:
+                yield ": keep-alive\n\n"
+                idle = 0.0
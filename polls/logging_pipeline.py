@@ -0,0 +1,154 @@
+"""A non-blocking logging pipeline.
+
+`QueuedHandler` replaces the file and console handlers on the request
+path: emitting a record only puts it on a bounded queue, and a
+`QueueListener` thread formats and writes it. When the queue fills up,
+records below WARNING are sampled and, once it is full, dropped, so a
+slow disk never stalls a vote. `JsonFormatter` writes each record as a
+line of JSON, including the fields passed through ``extra``.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else came from ``extra``.
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {
+    "message", "asctime", "taskName",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record):
+        """Return the record, and its extra fields, as JSON."""
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+def _get_handler(name):
+    """Return the handler configured under a name."""
+    get_handler = getattr(logging, "getHandlerByName", None)
+    if get_handler:
+        return get_handler(name)
+    return logging._handlers.get(name)
+
+
+class _Listener(QueueListener):
+    """A queue listener that waits for room to queue its stop signal."""
+
+    def enqueue_sentinel(self):
+        """Queue the stop signal behind the records already queued."""
+        self.queue.put(self._sentinel)
+
+
+class QueuedHandler(QueueHandler):
+    """Hand records to other handlers through a bounded queue.
+
+    `handlers` names the handlers, configured in the same LOGGING
+    setting, that the listener thread writes to. Once the queue is more
+    than `high_water` full, only one in `sample_every` records below
+    WARNING is kept; when it is full, records are dropped.
+    """
+
+    def __init__(self, handlers, maxsize=10_000, high_water=0.5,
+                 sample_every=10):
+        """Create the queue; the listener starts with the first record."""
+        super().__init__(queue.Queue(maxsize))
+        self.handler_names = handlers
+        self.maxsize = maxsize
+        self.high_water = int(maxsize * high_water)
+        self.sample_every = sample_every
+        self.listener = None
+        self._lock = threading.Lock()
+        self._skipped = 0
+        self._stats = {"queued": 0, "sampled_out": 0, "dropped": 0,
+                       "emit_seconds": 0.0, "max_emit_seconds": 0.0}
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        """Give a forked worker its own queue; its listener isn't running."""
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the listener thread writing to the named handlers."""
+        with self._lock:
+            if self.listener is None:
+                handlers = [_get_handler(name) for name in self.handler_names]
+                self.listener = _Listener(
+                    self.queue, *filter(None, handlers),
+                    respect_handler_level=True)
+                self.listener.start()
+                atexit.register(self.stop)
+
+    def stop(self):
+        """Write out the queued records and stop the listener."""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def emit(self, record):
+        """Queue a record, timing how long the caller is held up."""
+        started = time.perf_counter()
+        if self.listener is None:
+            self.start()
+        super().emit(record)
+        elapsed = time.perf_counter() - started
+        self._stats["emit_seconds"] += elapsed
+        if elapsed > self._stats["max_emit_seconds"]:
+            self._stats["max_emit_seconds"] = elapsed
+
+    def enqueue(self, record):
+        """Queue a record unless the queue is under pressure."""
+        if (record.levelno < logging.WARNING
+                and self.queue.qsize() >= self.high_water):
+            self._skipped += 1
+            if self._skipped % self.sample_every:
+                self._stats["sampled_out"] += 1
+                return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._stats["dropped"] += 1
+        else:
+            self._stats["queued"] += 1
+
+    def stats(self):
+        """Return the queue's counters and the time spent emitting."""
+        emitted = (self._stats["queued"] + self._stats["sampled_out"]
+                   + self._stats["dropped"])
+        return {
+            **self._stats,
+            "backlog": self.queue.qsize(),
+            "mean_emit_seconds": (self._stats["emit_seconds"] / emitted
+                                  if emitted else 0),
+        }
+
+
+def pipeline_stats():
+    """Return the statistics of every queued handler in use."""
+    return {
+        handler.name: handler.stats()
+        for handler in logging.getLogger("polls").handlers
+        if isinstance(handler, QueuedHandler)
+    }
@@ -0,0 +1,101 @@
+"""Compare the sync (WSGI) and async (ASGI) views under load."""
+
+import asyncio
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from polls.models import Question
+
+
+def summary(latencies, seconds):
+    """Return the throughput and latency percentiles of a run."""
+    latencies = sorted(latencies)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    return {
+        "rps": len(latencies) / seconds,
+        "p50": percentile(0.50) * 1000,
+        "p99": percentile(0.99) * 1000,
+    }
+
+
+class Command(BaseCommand):
+    """Request the poll pages through the WSGI and ASGI handlers."""
+
+    help = ("Request the index, detail and results pages through the WSGI "
+            "handler (sync views) and the ASGI handler (async views), and "
+            "report requests/sec and p50/p99 latency. Requests are made "
+            "in-process, so this measures the handlers and views, not the "
+            "network or the server.")
+
+    def add_arguments(self, parser):
+        """Set the load."""
+        parser.add_argument("--requests", type=int, default=600)
+        parser.add_argument("--concurrency", type=int, default=20)
+
+    def handle(self, *args, **options):
+        """Run both benchmarks and print their results."""
+        question = Question.objects.published().first()
+        if question is None:
+            raise CommandError("There are no published polls to request, "
+                               "seed some first, e.g. with seed_polls.")
+        paths = [reverse("polls:index"),
+                 reverse("polls:detail", args=(question.id,)),
+                 reverse("polls:results", args=(question.id,))]
+        n, concurrency = options["requests"], options["concurrency"]
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            wsgi = self.run_wsgi(paths, n, concurrency)
+            with override_settings(ROOT_URLCONF="mysite.async_urls"):
+                asgi = asyncio.run(self.run_asgi(paths, n, concurrency))
+        self.stdout.write(f"{n} requests, {concurrency} at a time")
+        for name, result in [("WSGI sync", wsgi), ("ASGI async", asgi)]:
+            self.stdout.write(
+                f"{name:>10}: {result['rps']:.0f} req/s, "
+                f"p50 {result['p50']:.1f} ms, p99 {result['p99']:.1f} ms"
+            )
+
+    def run_wsgi(self, paths, n, concurrency):
+        """Request the pages from a pool of threads."""
+        latencies = []
+
+        def work(count):
+            client = Client()
+            try:
+                for i in range(count):
+                    started = time.perf_counter()
+                    client.get(paths[i % len(paths)])
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work,
+                                    args=(len(range(i, n, concurrency)),))
+                   for i in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summary(latencies, time.perf_counter() - started)
+
+    async def run_asgi(self, paths, n, concurrency):
+        """Request the pages from concurrent tasks on one event loop."""
+        latencies = []
+        slots = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def request(i):
+            async with slots:
+                started = time.perf_counter()
+                await client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(request(i) for i in range(n)))
+        return summary(latencies, time.perf_counter() - started)
@@ -0,0 +1,76 @@
+"""Measure what connecting to PostgreSQL costs each request."""
+
+import time
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.utils import ConnectionHandler
+
+
+class Command(BaseCommand):
+    """Time requests' queries with fresh, persistent and pooled connections.
+
+    Each simulated request runs one trivial query and then ends the way
+    Django ends a request: a fresh connection is closed, a persistent one
+    is kept, and a pooled one is returned to the pool.
+    """
+
+    help = ("Compare the time per request of opening a new PostgreSQL "
+            "connection every time, keeping a persistent connection "
+            "(CONN_MAX_AGE) and borrowing one from a pool (DB_POOL).")
+
+    def add_arguments(self, parser):
+        """Set the number of simulated requests."""
+        parser.add_argument("--requests", type=int, default=500)
+
+    def handle(self, *args, **options):
+        """Run each mode against the default database."""
+        if connection.vendor != "postgresql":
+            raise CommandError("Connection pooling needs PostgreSQL, the "
+                               f"default database is {connection.vendor}.")
+        n = options["requests"]
+        settings_dict = {**connection.settings_dict, "CONN_MAX_AGE": 0}
+        settings_dict["OPTIONS"] = {
+            key: value for key, value in settings_dict["OPTIONS"].items()
+            if key != "pool"
+        }
+        modes = [
+            ("new connection", settings_dict, True),
+            ("persistent", settings_dict, False),
+            ("pooled", {**settings_dict, "OPTIONS": {
+                **settings_dict["OPTIONS"],
+                "pool": {"min_size": 1, "max_size": 4},
+            }}, True),
+        ]
+        self.stdout.write(f"{n} requests each, one query per request")
+        baseline = None
+        for name, mode_settings, close in modes:
+            try:
+                seconds = self.run(mode_settings, close, n)
+            except ImproperlyConfigured:
+                self.stdout.write(f"{name:>15}: skipped, install "
+                                  f"psycopg[pool] to use a pool")
+                continue
+            per_request = seconds / n * 1000
+            baseline = baseline or per_request
+            self.stdout.write(
+                f"{name:>15}: {per_request:.3f} ms/request, "
+                f"{n / seconds:.0f} requests/sec, "
+                f"{baseline / per_request:.1f}x"
+            )
+
+    def run(self, settings_dict, close, n):
+        """Return the seconds `n` simulated requests take."""
+        # Pools are kept per alias, so don't touch the site's own pool.
+        db = ConnectionHandler({"benchmark": settings_dict})["benchmark"]
+        try:
+            started = time.perf_counter()
+            for _ in range(n):
+                with db.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                if close:
+                    db.close()
+            return time.perf_counter() - started
+        finally:
+            db.close()
+            db.close_pool()
@@ -0,0 +1,69 @@
+"""Measure the overhead of the vote rate limiter."""
+
+import time
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from polls.ratelimit import PERIODS, SlidingWindow, rate_limited
+
+DAY = PERIODS["d"]
+
+
+def bare_view(request):
+    """Answer without doing anything, to time what wraps it."""
+    return HttpResponse()
+
+
+class Command(BaseCommand):
+    """Time rate-limit checks alone and around a view."""
+
+    help = ("Time a rate-limit window admitting and refusing requests, "
+            "and the per-request overhead of a rate-limited view over "
+            "the same view undecorated, in microseconds. The windows are "
+            "counted in the configured cache, so this measures its "
+            "round trips.")
+
+    def add_arguments(self, parser):
+        """Set the number of timed calls."""
+        parser.add_argument("--calls", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        """Run each timing and print the cost per call."""
+        n = options["calls"]
+        admitting = SlidingWindow("bench:admit", 2 * n, DAY)
+        refusing = SlidingWindow("bench:refuse", 1, DAY)
+        refusing.take("client")
+        request = RequestFactory().post("/", REMOTE_ADDR="10.0.0.1")
+        request.user = User(pk=1, username="voter")
+        limits = {"bench": {"ip": f"{2 * n}/d", "user": f"{2 * n}/d"}}
+        with override_settings(RATE_LIMITS=limits):
+            limited_view = rate_limited("bench")(bare_view)
+            bare = self.time(n, bare_view, request)
+            timings = [
+                ("window admits", self.time(n, admitting.take, "client")),
+                ("window refuses", self.time(n, refusing.take, "client")),
+                ("view overhead", self.time(n, limited_view, request) - bare),
+            ]
+        with override_settings(RATE_LIMITS={"bench": {"user": "1/d"}}):
+            limited_view(request)
+            timings.append(("429 response",
+                            self.time(n, limited_view, request)))
+        # Don't leave the counters behind in a shared cache.
+        admitting.reset("client")
+        refusing.reset("client")
+        SlidingWindow("bench:ip", 1, DAY).reset("10.0.0.1")
+        SlidingWindow("bench:user", 1, DAY).reset(request.user.pk)
+        backend = type(caches["default"]).__name__
+        self.stdout.write(f"{n} calls each ({backend})")
+        for name, seconds in timings:
+            self.stdout.write(f"{name:>14}: {seconds * 1e6:.2f} µs per call")
+
+    def time(self, n, call, *args):
+        """Return the mean time of `n` calls of `call(*args)`."""
+        started = time.perf_counter()
+        for _ in range(n):
+            call(*args)
+        return (time.perf_counter() - started) / n
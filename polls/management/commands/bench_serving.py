@@ -0,0 +1,162 @@
+"""Compare the old runserver entrypoint with the gunicorn one.
+
+Both entrypoints load fixtures, which overwrite rows by primary key, so
+each is run against a throwaway database created for the benchmark and
+dropped after it, never the configured one.
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from polls.management.commands.bench_asgi import summary
+from polls.management.commands.load_demo_data import FIXTURES
+
+MANAGE = [sys.executable, str(settings.BASE_DIR / "manage.py")]
+
+# The start-up steps and server of each entrypoint.sh.
+ENTRYPOINTS = {
+    "runserver": {
+        "steps": [["migrate"], ["loaddata", *FIXTURES], ["reconcile_votes"]],
+        "server": MANAGE + ["runserver", "{bind}"],
+        # The old entrypoint relied on DEBUG to serve the static files.
+        "env": {"DEBUG": "True"},
+    },
+    "gunicorn": {
+        "steps": [["migrate", "--noinput"], ["load_demo_data"],
+                  ["poll_scheduler"]],
+        "server": [sys.executable, "-m", "gunicorn", "--config",
+                   str(settings.BASE_DIR / "mysite" / "gunicorn.conf.py"),
+                   "--bind", "{bind}", "--access-logfile", os.devnull],
+        "env": {},
+    },
+}
+
+
+class Command(BaseCommand):
+    """Start each entrypoint, then load it with concurrent requests."""
+
+    help = ("Run the start-up steps and server of the old (runserver) and "
+            "new (gunicorn) entrypoint, each against a new, empty "
+            "PostgreSQL database named after the configured one with a "
+            "_bench suffix, and report the time until the first page is "
+            "served and the requests/sec of the index page and the "
+            "stylesheet.")
+
+    def add_arguments(self, parser):
+        """Set where to serve and how hard to load the servers."""
+        parser.add_argument("--bind", default="127.0.0.1:8765")
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--only", choices=ENTRYPOINTS)
+
+    def handle(self, *args, **options):
+        """Benchmark each entrypoint in turn."""
+        if connection.vendor != "postgresql":
+            raise CommandError("The benchmark creates its own PostgreSQL "
+                               "database, which needs PostgreSQL.")
+        database = f"{connection.settings_dict['NAME']}_bench"
+        self.call(["collectstatic", "--noinput"], {})
+        base = f"http://{options['bind']}"
+        stylesheet = "/" + settings.STATIC_URL.lstrip("/") + "polls/style.css"
+        paths = ["/polls/", stylesheet]
+        for name, entrypoint in ENTRYPOINTS.items():
+            if options["only"] not in (None, name):
+                continue
+            env = {**entrypoint["env"], "DB_NAME": database}
+            self.create_database(database)
+            server = None
+            try:
+                started = time.perf_counter()
+                for step in entrypoint["steps"]:
+                    self.call(step, env)
+                server = subprocess.Popen(
+                    [arg.format(bind=options["bind"])
+                     for arg in entrypoint["server"]],
+                    env={**os.environ, **env},
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                    start_new_session=True,
+                )
+                self.wait_until_up(base + paths[0], server)
+                startup = time.perf_counter() - started
+                result = self.load(base, paths, options)
+            finally:
+                if server is not None:
+                    if server.poll() is None:
+                        os.killpg(server.pid, signal.SIGTERM)
+                    server.wait()
+                self.drop_database(database)
+            self.stdout.write(
+                f"{name:>10}: up in {startup:.1f}s, "
+                f"{result['rps']:.0f} req/s, p50 {result['p50']:.1f} ms, "
+                f"p99 {result['p99']:.1f} ms, {result['errors']} errors"
+            )
+
+    def create_database(self, name):
+        """Create an empty database, replacing one left by an earlier run."""
+        self.drop_database(name)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE DATABASE {connection.ops.quote_name(name)}")
+
+    def drop_database(self, name):
+        """Drop a benchmark database, closing its leftover connections."""
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS "
+                           f"{connection.ops.quote_name(name)} WITH (FORCE)")
+
+    def call(self, step, env):
+        """Run a manage.py command in its own process, like the shell."""
+        subprocess.run(MANAGE + step, env={**os.environ, **env}, check=True,
+                       stdout=subprocess.DEVNULL)
+
+    def wait_until_up(self, url, server, timeout=60):
+        """Wait until the server answers `url`."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(
+                    f"The server exited with {server.returncode}.")
+            try:
+                with urllib.request.urlopen(url, timeout=1):
+                    return
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.05)
+        raise CommandError(f"{url} didn't answer within {timeout}s.")
+
+    def load(self, base, paths, options):
+        """Request the paths from many threads for a while."""
+        latencies = []
+        errors = []
+        deadline = time.perf_counter() + options["seconds"]
+
+        def work(offset):
+            i = offset
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(base + paths[i % len(paths)],
+                                                timeout=10) as response:
+                        response.read()
+                except (urllib.error.URLError, ConnectionError) as error:
+                    errors.append(error)
+                latencies.append(time.perf_counter() - started)
+                i += 1
+
+        threads = [threading.Thread(target=work, args=(i,))
+                   for i in range(options["concurrency"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {**summary(latencies, time.perf_counter() - started),
+                "errors": len(errors)}
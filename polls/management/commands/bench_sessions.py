@@ -0,0 +1,113 @@
+"""Measure what sessions and authentication cost a signed-in voter."""
+
+import datetime
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import backends, lifecycle, results, user_votes
+from polls.models import Choice, Question
+
+SESSION_BACKENDS = ["db", "cached_db", "signed_cookies"]
+
+USER_BACKENDS = [
+    ("model", "django.contrib.auth.backends.ModelBackend"),
+    ("cached", "polls.backends.CachedModelBackend"),
+]
+
+
+class Rollback(Exception):
+    """Raised to throw away the voter, the poll and their sessions."""
+
+
+class Command(BaseCommand):
+    """Vote as a signed-in user with each session and user backend.
+
+    The first request of each mode warms the caches and is not counted.
+    Everything is created in a transaction that is rolled back.
+    """
+
+    help = ("Cast votes as a signed-in user with database, cached and "
+            "signed-cookie sessions, loading the user from the database "
+            "or the cache, and report the queries and latency per vote "
+            "request.")
+
+    def add_arguments(self, parser):
+        """Set the number of votes per mode."""
+        parser.add_argument("--requests", type=int, default=200)
+
+    def handle(self, *args, **options):
+        """Run every mode inside a transaction and print the results."""
+        try:
+            with transaction.atomic():
+                rows = self.benchmark(options["requests"])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            # Nothing cached about the rolled-back rows may outlive them.
+            if hasattr(self, "question"):
+                backends.forget([self.user.pk])
+                user_votes.forget([self.user.pk])
+                results.bump_version(self.question.pk)
+                lifecycle.advance()
+        self.stdout.write(f"{options['requests']} vote requests per mode "
+                          f"({connection.vendor})")
+        for session, user, queries, timings in rows:
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(
+                f"{session:>14} sessions, {user:>6} user: "
+                f"{queries:.1f} queries, "
+                f"median {statistics.median(timings):.2f} ms, "
+                f"p95 {p95:.2f} ms"
+            )
+
+    def benchmark(self, n):
+        """Return the queries and timings of each mode's vote requests."""
+        self.user = get_user_model().objects.create_user(
+            "bench-sessions-voter", password="unused")
+        self.question = Question.objects.create(
+            question_text="Sessions benchmark",
+            pub_date=timezone.now() - datetime.timedelta(days=1))
+        choices = [
+            Choice.objects.create(question=self.question, choice_text=text)
+            for text in ("Yes", "No")
+        ]
+        path = reverse("polls:vote", args=(self.question.id,))
+        rows = []
+        for session in SESSION_BACKENDS:
+            for name, backend in USER_BACKENDS:
+                with override_settings(
+                    SESSION_ENGINE=f"django.contrib.sessions.backends."
+                                   f"{session}",
+                    AUTHENTICATION_BACKENDS=[backend],
+                    ALLOWED_HOSTS=["testserver"],
+                    RATE_LIMITS={},
+                ):
+                    queries, timings = self.run(path, choices, n)
+                rows.append((session, name, queries, timings))
+        return rows
+
+    def run(self, path, choices, n):
+        """Vote n times, alternating choices, after one warm-up vote."""
+        client = Client()
+        client.force_login(self.user)
+        client.post(path, {"choice": choices[-1].id})
+        queries = 0
+        timings = []
+        for i in range(n):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                client.post(path, {"choice": choices[i % 2].id})
+                timings.append((time.perf_counter() - started) * 1000)
+            queries += len(captured)
+            # The results page would show, and so drop, the vote message.
+            client.cookies.pop("messages", None)
+        return queries / n, timings
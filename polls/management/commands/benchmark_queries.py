@@ -0,0 +1,119 @@
+"""Benchmark the queries behind the index, detail and results pages."""
+
+import datetime
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from polls.models import Choice, Question
+from polls.results import tally
+
+
+class Rollback(Exception):
+    """Raised to throw away the seeded questions."""
+
+
+class Command(BaseCommand):
+    """Seed many questions, then EXPLAIN and time the page queries."""
+
+    help = ("Seed questions in a transaction that is rolled back, and print "
+            "the query plans and timings of the index, detail and results "
+            "queries.")
+
+    def add_arguments(self, parser):
+        """Set the size of the seeded data and the number of runs."""
+        parser.add_argument("--questions", type=int, default=100_000)
+        parser.add_argument("--choices", type=int, default=3,
+                            help="Choices per question.")
+        parser.add_argument("--repeat", type=int, default=50,
+                            help="How many times each query is timed.")
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument("--analyze", action="store_true",
+                            help="Use EXPLAIN ANALYZE (PostgreSQL only).")
+
+    def handle(self, *args, **options):
+        """Seed the data and benchmark the queries inside a transaction."""
+        try:
+            with transaction.atomic():
+                self.seed(options)
+                self.benchmark(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, options):
+        """Create questions spread over the past two years and next month."""
+        now = timezone.now()
+        rng = random.Random(0)
+        started = time.perf_counter()
+        questions = []
+        for n in range(options["questions"]):
+            age = rng.randint(-30 * 24 * 60, 2 * 365 * 24 * 60)
+            pub_date = now - datetime.timedelta(minutes=age)
+            end_date = None
+            if rng.random() < 0.75:
+                length = datetime.timedelta(days=rng.randint(1, 60))
+                end_date = pub_date + length
+            question = Question(question_text=f"Question {n}",
+                                pub_date=pub_date, end_date=end_date)
+            question.status = question.current_status()
+            questions.append(question)
+        questions = Question.objects.bulk_create(
+            questions, batch_size=options["batch_size"])
+        Choice.objects.bulk_create(
+            (Choice(question=question, choice_text=f"Choice {n}")
+             for question in questions for n in range(options["choices"])),
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            f"Seeded {options['questions']} questions in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+
+    def benchmark(self, options):
+        """Print the plan and timings of each page's queries."""
+        question = Question.objects.published() \
+            .filter(choice__isnull=False).first()
+        if question is None:
+            raise CommandError("There is no published question with choices "
+                               "to benchmark, seed more --questions with "
+                               "at least one of --choices.")
+        index = Question.objects.published()[:11]
+        detail = Question.objects.filter(pk=question.pk)
+        choices = Choice.objects.filter(question_id=question.pk)
+        results = Choice.objects.filter(question_id=question.pk) \
+            .order_by("pk").values_list("pk", "choice_text", "votes")
+        explain = {"analyze": True} if options["analyze"] else {}
+        for name, queryset in [("index", index), ("detail", detail),
+                               ("detail choices", choices),
+                               ("results", results)]:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} query"))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain))
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"timings over {options['repeat']} runs ({connection.vendor})"))
+        pages = [
+            ("index", lambda: list(Question.objects.published()[:11])),
+            ("detail", lambda: (Question.objects.get(pk=question.pk),
+                                list(choices.all()))),
+            ("results", lambda: tally(question.pk)),
+        ]
+        for name, run in pages:
+            self.time(name, run, options["repeat"])
+
+    def time(self, name, run, repeat):
+        """Run a query `repeat` times and print its median and p95 time."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{name:>8}: median {statistics.median(timings):.3f} ms, "
+            f"p95 {p95:.3f} ms"
+        )
@@ -0,0 +1,36 @@
+"""Export the results or raw votes of a poll."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import export
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """Stream a question's results or votes as CSV or NDJSON."""
+
+    help = "Stream a question's results or raw votes as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        """Choose the question, what to export and how."""
+        parser.add_argument("question_id", type=int)
+        parser.add_argument("--kind", choices=sorted(export.KINDS),
+                            default="results")
+        parser.add_argument("--format", choices=sorted(export.FORMATS),
+                            default="csv")
+        parser.add_argument("--output", "-o",
+                            help="Write to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        """Write the export line by line."""
+        try:
+            question = Question.objects.get(pk=options["question_id"])
+        except Question.DoesNotExist:
+            raise CommandError(f"No question {options['question_id']}.")
+        lines = export.export(question, options["kind"], options["format"])
+        if options["output"]:
+            with open(options["output"], "w", newline="") as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,44 @@
+"""Apply the votes queued in the write-behind buffer."""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.buffer import get_buffer
+from polls.management.commands.seed_polls import positive
+
+
+class Command(BaseCommand):
+    """Flush the vote buffer to the database, once or continuously."""
+
+    help = ("Apply the vote intents queued in the write-behind buffer "
+            "(VOTE_BUFFER) to the database in bulk.")
+
+    def add_arguments(self, parser):
+        """Choose how often and how much to flush."""
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Keep flushing every INTERVAL seconds; 0 flushes once.")
+        parser.add_argument("--batch-size", type=positive, default=10_000)
+
+    def handle(self, *args, **options):
+        """Flush until the buffer is empty, then wait for the next round."""
+        vote_buffer = get_buffer()
+        if vote_buffer is None:
+            raise CommandError("The vote buffer is off, set VOTE_BUFFER=True.")
+        self.stdout.write(f"Flushing {settings.VOTE_BUFFER_PATH}")
+        while True:
+            flushed = 0
+            while count := vote_buffer.flush(options["batch_size"]):
+                flushed += count
+            if flushed:
+                stats = vote_buffer.stats()
+                self.stdout.write(
+                    f"flushed {flushed} intents, "
+                    f"{stats['flushed_per_sec']} intents/sec overall, "
+                    f"{stats['dead']} rejected so far"
+                )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
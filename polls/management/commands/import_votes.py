@@ -0,0 +1,48 @@
+"""Import ballots collected outside the web application."""
+
+import sys
+
+from django.core.management.base import BaseCommand
+
+from polls.importer import VoteImporter, parse_ballots
+from polls.management.commands.seed_polls import positive
+
+
+class Command(BaseCommand):
+    """Bulk import votes from a CSV or NDJSON file."""
+
+    help = ("Import (username, question_id, choice_id) records from a CSV "
+            "or NDJSON file in chunked transactions.")
+
+    def add_arguments(self, parser):
+        """Choose the input and how it is batched."""
+        parser.add_argument("path", help="The file to import, - for stdin.")
+        parser.add_argument("--format", choices=["csv", "ndjson"],
+                            default="csv")
+        parser.add_argument("--batch-size", type=positive, default=1000)
+
+    def handle(self, *args, **options):
+        """Import the records, reporting each batch and rejected rows."""
+        importer = VoteImporter(options["batch_size"])
+        if options["path"] == "-":
+            self.run(importer, sys.stdin, options["format"])
+        else:
+            with open(options["path"], newline="") as lines:
+                self.run(importer, lines, options["format"])
+        for number, reason in importer.rejected:
+            self.stderr.write(f"line {number}: {reason}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {importer.imported} votes, "
+            f"rejected {len(importer.rejected)} records."
+        ))
+
+    def run(self, importer, lines, fmt):
+        """Import the records of an open file."""
+        def report(batch):
+            rate = batch["votes"] / batch["seconds"] if batch["seconds"] else 0
+            self.stdout.write(
+                f"batch: {batch['votes']} votes, {batch['rejected']} "
+                f"rejected in {batch['seconds']:.2f}s ({rate:.0f} votes/sec)"
+            )
+
+        importer.run(parse_ballots(lines, fmt), on_batch=report)
@@ -0,0 +1,34 @@
+"""Load the demo polls, votes and users, unless there already are polls."""
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from polls import lifecycle
+from polls.models import Question
+
+FIXTURES = ["data/polls-v4.json", "data/votes-v4.json", "data/users.json"]
+
+
+class Command(BaseCommand):
+    """Seed an empty database with the demo data, once."""
+
+    help = ("Load the demo fixtures, count their votes and open their polls. "
+            "Does nothing when the database already has polls, so it is "
+            "safe and quick to run on every start.")
+
+    def add_arguments(self, parser):
+        """Allow loading the fixtures over existing data."""
+        parser.add_argument("--force", action="store_true",
+                            help="Load the fixtures even if there are polls.")
+
+    def handle(self, *args, **options):
+        """Load the fixtures if the database has no polls yet."""
+        if Question.objects.exists() and not options["force"]:
+            self.stdout.write("The database already has polls, "
+                              "skipped loading the demo data.")
+            return
+        call_command("loaddata", *FIXTURES, stdout=self.stdout)
+        call_command("reconcile_votes", stdout=self.stdout)
+        # loaddata saves rows raw, skipping Question.save(), so the
+        # fixtures' statuses are set here.
+        lifecycle.advance()
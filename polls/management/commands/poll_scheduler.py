@@ -0,0 +1,45 @@
+"""Open and close polls as their dates pass."""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls import lifecycle
+
+
+class Command(BaseCommand):
+    """Advance the questions' statuses, once or as a worker."""
+
+    help = ("Open and close the questions whose publication or end date "
+            "has passed, and invalidate the cached pages when any did.")
+
+    def add_arguments(self, parser):
+        """Choose between a single run and a worker."""
+        parser.add_argument(
+            "--watch", action="store_true",
+            help="Keep running, waking up at each open or close.")
+        parser.add_argument(
+            "--interval", type=float,
+            default=lifecycle.RECHECK.total_seconds(),
+            help="With --watch, the longest to sleep between checks, so "
+                 "edited dates are picked up (default: %(default)s "
+                 "seconds).")
+
+    def handle(self, *args, **options):
+        """Advance now, then sleep until the next boundary if watching."""
+        while True:
+            moved = lifecycle.advance()
+            upcoming = lifecycle.next_transition()
+            if moved or not options["watch"]:
+                self.stdout.write(
+                    f"{moved} questions changed status, next change "
+                    f"{upcoming.isoformat() if upcoming else 'never'}"
+                )
+            if not options["watch"]:
+                break
+            wait = options["interval"]
+            if upcoming:
+                until = (upcoming - timezone.now()).total_seconds()
+                wait = max(0, min(wait, until))
+            time.sleep(wait)
@@ -0,0 +1,39 @@
+"""Rebuild the denormalized vote counters of choices."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from polls.models import Choice
+from polls.results import bump_version
+
+
+class Command(BaseCommand):
+    """Recount `Choice.votes` from the Vote table."""
+
+    help = "Recount the vote counter of every choice from the Vote table."
+
+    def add_arguments(self, parser):
+        """Allow limiting the recount to some questions."""
+        parser.add_argument(
+            "question_ids", nargs="*", type=int,
+            help="Only reconcile the choices of these questions.",
+        )
+
+    def handle(self, *args, **options):
+        """Recount the votes and report how many counters were fixed.
+
+        Cached results of the questions whose counters changed are
+        invalidated once the recount is committed.
+        """
+        choices = Choice.objects.all()
+        if options["question_ids"]:
+            choices = choices.filter(question_id__in=options["question_ids"])
+        with transaction.atomic():
+            questions = set(choices.drifted()
+                            .values_list("question_id", flat=True))
+            fixed = choices.reconcile_votes()
+        for question_id in questions:
+            bump_version(question_id)
+        self.stdout.write(
+            self.style.SUCCESS(f"Reconciled votes, fixed {fixed} choice(s).")
+        )
@@ -0,0 +1,193 @@
+"""Generate synthetic users, polls and votes at a configurable scale."""
+
+import argparse
+import datetime
+import random
+import time
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from polls import lifecycle
+from polls.models import Choice, Question, Vote
+from polls.results import bump_version
+
+
+def positive(value):
+    """Parse a command-line count that must be at least 1."""
+    count = int(value)
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {count}")
+    return count
+
+
+def batched(rows, size):
+    """Yield lists of up to `size` rows from an iterable."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    """Stream synthetic data into the database in batches."""
+
+    help = ("Generate synthetic users, questions, choices and votes, "
+            "inserting them in batches and reporting rows/sec.")
+
+    def add_arguments(self, parser):
+        """Set the scale of the generated data."""
+        parser.add_argument("--users", type=int, default=1_000)
+        parser.add_argument("--questions", type=int, default=100)
+        parser.add_argument("--choices", type=positive, default=4,
+                            help="Choices per question.")
+        parser.add_argument("--votes", type=int, default=20_000)
+        parser.add_argument("--batch-size", type=positive, default=5_000)
+        parser.add_argument("--prefix", default="seed",
+                            help="Prefix of the generated usernames.")
+        parser.add_argument("--password", default="hackme11",
+                            help="Password of every generated user.")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Seed of the random generator.")
+        parser.add_argument("--no-copy", action="store_true",
+                            help="Insert votes with bulk_create even on "
+                                 "PostgreSQL, instead of COPY.")
+
+    def handle(self, *args, **options):
+        """Generate everything in one transaction."""
+        if options["votes"] > options["users"] * options["questions"]:
+            raise CommandError("Each user can vote once per question, so "
+                               "--votes can't exceed --users * --questions.")
+        if User.objects.filter(
+                username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Users prefixed {options['prefix']!r} "
+                               f"already exist, choose another --prefix.")
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        with transaction.atomic():
+            user_ids = self.create_users(options)
+            choice_ids = self.create_polls(options)
+            self.create_votes(user_ids, choice_ids, options)
+            self.timed("counters", lambda: Choice.objects.filter(
+                question_id__in=choice_ids).reconcile_votes())
+        # bulk_create() skips the signal that reschedules the lifecycle.
+        lifecycle.advance()
+        for question_id in choice_ids:
+            bump_version(question_id)
+
+    def timed(self, name, insert):
+        """Run `insert` and report how fast it wrote its rows.
+
+        `insert` returns either the created objects or a row count.
+        """
+        started = time.perf_counter()
+        result = insert()
+        seconds = time.perf_counter() - started
+        rows = result if isinstance(result, int) else len(result)
+        self.stdout.write(f"{name:>9}: {rows} rows in {seconds:.2f}s "
+                          f"({rows / seconds if seconds else 0:.0f} rows/sec)")
+        return result
+
+    def bulk_create(self, model, rows, keep=True):
+        """Insert rows in batches.
+
+        Returns:
+            the created objects, or just their number unless `keep` is set,
+            so that large tables don't pile up in memory.
+        """
+        created, count = [], 0
+        for batch in batched(rows, self.batch_size):
+            batch = model.objects.bulk_create(batch)
+            count += len(batch)
+            if keep:
+                created.extend(batch)
+        return created if keep else count
+
+    def create_users(self, options):
+        """Create the users, all sharing one precomputed password hash."""
+        password = make_password(options["password"])
+        users = self.timed("users", lambda: self.bulk_create(
+            User, (User(username=f"{options['prefix']}-{n}", password=password)
+                   for n in range(options["users"]))
+        ))
+        return [user.pk for user in users]
+
+    def create_polls(self, options):
+        """Create questions and their choices.
+
+        Returns:
+            a dict mapping each question id to its choice ids.
+        """
+        now = timezone.now()
+
+        def make_question(n):
+            pub_date = now - datetime.timedelta(
+                minutes=self.rng.randint(0, 365 * 24 * 60))
+            end_date = None
+            if self.rng.random() < 0.5:
+                end_date = pub_date + datetime.timedelta(
+                    days=self.rng.randint(1, 60))
+            question = Question(question_text=f"Seeded question {n}",
+                                pub_date=pub_date, end_date=end_date)
+            # bulk_create() skips save(), which materializes the status.
+            question.status = question.current_status()
+            return question
+
+        questions = self.timed("questions", lambda: self.bulk_create(
+            Question, (make_question(n) for n in range(options["questions"]))
+        ))
+        choices = self.timed("choices", lambda: self.bulk_create(
+            Choice, (Choice(question=question, choice_text=f"Choice {n}")
+                     for question in questions
+                     for n in range(options["choices"]))
+        ))
+        choice_ids = {question.pk: [] for question in questions}
+        for choice in choices:
+            choice_ids[choice.question_id].append(choice.pk)
+        return choice_ids
+
+    def generate_votes(self, user_ids, choice_ids, total):
+        """Yield (question id, choice id, user id) rows, once per pair.
+
+        Votes are spread evenly over the users, and each user votes on
+        distinct questions, so the rows respect one vote per question.
+        """
+        question_ids = list(choice_ids)
+        per_user, extra = divmod(total, len(user_ids))
+        for n, user_id in enumerate(user_ids):
+            count = per_user + (n < extra)
+            for question_id in self.rng.sample(question_ids, count):
+                choice_id = self.rng.choice(choice_ids[question_id])
+                yield question_id, choice_id, user_id
+
+    def create_votes(self, user_ids, choice_ids, options):
+        """Stream the votes in, with COPY on PostgreSQL."""
+        if not options["votes"]:
+            return
+        rows = self.generate_votes(user_ids, choice_ids, options["votes"])
+        if connection.vendor == "postgresql" and not options["no_copy"]:
+            self.timed("votes", lambda: self.copy_votes(rows))
+        else:
+            self.timed("votes", lambda: self.bulk_create(
+                Vote, (Vote(question_id=q, choice_id=c, user_id=u)
+                       for q, c, u in rows),
+                keep=False,
+            ))
+
+    def copy_votes(self, rows):
+        """Insert the vote rows with PostgreSQL's COPY."""
+        count = 0
+        table = Vote._meta.db_table
+        with connection.cursor() as cursor:
+            with cursor.copy(f"COPY {table} (question_id, choice_id, user_id)"
+                             f" FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    count += 1
+        return count
@@ -0,0 +1,86 @@
+"""Measure the vote path under a burst of concurrent votes."""
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.buffer import get_buffer
+from polls.models import Choice, Question, Vote
+from polls.stress import vote_burst
+
+
+class Command(BaseCommand):
+    """Cast concurrent votes on a throwaway poll and check the outcome."""
+
+    help = "Fire simultaneous votes from a thread pool and report votes/sec."
+
+    def add_arguments(self, parser):
+        """Set the size of the burst."""
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--choices", type=int, default=4)
+        parser.add_argument(
+            "--submissions", type=int, default=3,
+            help="How many times each user submits a vote.",
+        )
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument(
+            "--buffered", action="store_true",
+            help="Queue the votes in the write-behind buffer, then flush it.",
+        )
+
+    def handle(self, *args, **options):
+        """Run the burst, verify it and clean up after it."""
+        question = Question.objects.create(question_text="Stress test poll")
+        try:
+            choices = Choice.objects.bulk_create(
+                Choice(question=question, choice_text=f"Choice {n}")
+                for n in range(options["choices"])
+            )
+            prefix = f"stress-{question.id}-"
+            User.objects.bulk_create(User(username=f"{prefix}{n}")
+                                     for n in range(options["users"]))
+            users = list(User.objects.filter(username__startswith=prefix))
+            if options["buffered"]:
+                vote_buffer = get_buffer()
+                if vote_buffer is None:
+                    raise CommandError("The vote buffer is off, "
+                                       "set VOTE_BUFFER=True.")
+                stats = vote_burst(users, choices, options["submissions"],
+                                   options["workers"], vote_buffer.cast)
+                started = time.perf_counter()
+                while vote_buffer.flush():
+                    pass
+                flush_seconds = time.perf_counter() - started
+                self.stdout.write(
+                    f"flushed {stats['votes']} intents in "
+                    f"{flush_seconds:.2f}s "
+                    f"({stats['votes'] / flush_seconds:.0f} votes/sec)"
+                )
+            else:
+                stats = vote_burst(users, choices, options["submissions"],
+                                   options["workers"])
+            self.check_votes(question, len(users))
+        finally:
+            User.objects.filter(
+                username__startswith=f"stress-{question.id}-"
+            ).delete()
+            question.delete()
+        self.stdout.write(
+            f"{stats['votes']} votes in {stats['seconds']:.2f}s "
+            f"({stats['votes_per_sec']:.0f} votes/sec), "
+            f"{len(stats['errors'])} failed"
+        )
+        self.stdout.write(
+            self.style.SUCCESS("One vote per user, counters match.")
+        )
+
+    def check_votes(self, question, num_users):
+        """Fail unless every user has exactly one vote, counted once."""
+        votes = Vote.objects.filter(question=question)
+        if votes.count() != num_users:
+            raise CommandError(
+                f"Expected {num_users} votes, found {votes.count()}."
+            )
+        if question.choice_set.reconcile_votes():
+            raise CommandError("Vote counters drifted from the Vote table.")
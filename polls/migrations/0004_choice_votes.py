@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:24
+
+from django.db import migrations, models
+
+
+def count_existing_votes(apps, schema_editor):
+    Choice = apps.get_model('polls', 'Choice')
+    counted = Choice.objects.annotate(n=models.Count('vote')).filter(n__gt=0)
+    for choice in counted.only('pk').iterator():
+        Choice.objects.filter(pk=choice.pk).update(votes=choice.n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_remove_choice_votes_vote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='votes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing_votes, migrations.RunPython.noop),
+    ]
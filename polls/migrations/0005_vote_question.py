@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_and_dedupe(apps, schema_editor):
+    """Fill in the question of each vote and keep one vote per question.
+
+    When a user voted more than once on a question, their latest vote is
+    kept and the vote counters of the affected choices are recounted.
+    """
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    Vote.objects.update(question=models.Subquery(
+        Choice.objects.filter(pk=models.OuterRef('choice')).values('question')
+    ))
+    duplicated = Vote.objects.values('user', 'question') \
+        .annotate(n=models.Count('pk'), latest=models.Max('pk')) \
+        .filter(n__gt=1)
+    for dup in list(duplicated):
+        extra = Vote.objects.filter(user=dup['user'],
+                                    question=dup['question']) \
+            .exclude(pk=dup['latest'])
+        choice_ids = set(extra.values_list('choice', flat=True))
+        extra.delete()
+        counted = Choice.objects.filter(pk__in=choice_ids) \
+            .annotate(n=models.Count('vote'))
+        for choice in counted:
+            Choice.objects.filter(pk=choice.pk).update(votes=choice.n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_choice_votes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+        migrations.RunPython(backfill_and_dedupe, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:05
+
+from django.db import migrations, models
+from django.db.models import Q
+from django.utils import timezone
+
+
+def materialize_status(apps, schema_editor):
+    Question = apps.get_model('polls', 'Question')
+    now = timezone.now()
+    published = Question.objects.filter(pub_date__lte=now)
+    published.filter(Q(end_date__isnull=True) | Q(end_date__gte=now)) \
+        .update(status='open')
+    published.filter(end_date__lt=now).update(status='closed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_question_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('open', 'Open'), ('closed', 'Closed')], default='scheduled', editable=False, max_length=9),
+        ),
+        migrations.RunPython(materialize_status, migrations.RunPython.noop),
+    ]
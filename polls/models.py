@@ -2,10 +2,28 @@
 
 import datetime
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib.auth.models import User
 
 
+class QuestionQuerySet(models.QuerySet):
+    """Queries over questions."""
+
+    def published(self):
+        """Return the published questions, the newest first.
+
+        Each question is annotated with `is_open`, read from its
+        materialized `status` instead of calling can_vote() per question.
+        """
+        return self.exclude(status=Question.Status.SCHEDULED).annotate(
+            is_open=models.ExpressionWrapper(
+                models.Q(status=Question.Status.OPEN),
+                output_field=models.BooleanField(),
+            )
+        ).order_by("-pub_date", "-pk")
+
+
 class Question(models.Model):
     """
     The Question model.
@@ -19,6 +37,34 @@ class Question(models.Model):
         "ending date for voting", default=None, null=True, blank=True
     )
 
+    class Status(models.TextChoices):
+        """Where a question is in its lifecycle."""
+
+        SCHEDULED = "scheduled"
+        OPEN = "open"
+        CLOSED = "closed"
+
+    # Materialized from the dates on save, and advanced as the dates pass
+    # by `polls.lifecycle`, so pages can trust it without checking the time.
+    status = models.CharField(max_length=9, choices=Status,
+                              default=Status.SCHEDULED, editable=False)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        """Index the dates the index page filters and sorts on."""
+
+        indexes = [
+            models.Index(fields=["pub_date", "id"],
+                         name="question_pub_date_idx"),
+            models.Index(fields=["end_date"], name="question_end_date_idx"),
+            # Polls without an end date stay open once published, so this
+            # partial index holds just the polls that are open for good.
+            models.Index(fields=["pub_date", "id"],
+                         condition=models.Q(end_date__isnull=True),
+                         name="question_open_ended_idx"),
+        ]
+
     def __str__(self):
         """Retrieve the question's text."""
         return self.question_text
@@ -38,6 +84,46 @@ class Question(models.Model):
             return self.is_published() and timezone.now() <= self.end_date
         return self.is_published()
 
+    def current_status(self):
+        """Compute the question's status from its dates."""
+        if not self.is_published():
+            return self.Status.SCHEDULED
+        if self.can_vote():
+            return self.Status.OPEN
+        return self.Status.CLOSED
+
+    def save(self, *args, **kwargs):
+        """Save the question, materializing its status from its dates."""
+        self.status = self.current_status()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "status"}
+        super().save(*args, **kwargs)
+
+
+class ChoiceQuerySet(models.QuerySet):
+    """Queries over choices."""
+
+    def _actual_votes(self):
+        """Return an expression counting the votes of a choice."""
+        actual = Vote.objects.filter(choice=models.OuterRef("pk")) \
+            .order_by().values("choice").annotate(n=models.Count("pk")) \
+            .values("n")
+        return Coalesce(models.Subquery(actual), 0)
+
+    def drifted(self):
+        """Return those of these choices whose counter is out of step."""
+        return self.annotate(actual=self._actual_votes()) \
+            .exclude(votes=models.F("actual"))
+
+    def reconcile_votes(self):
+        """Recount the votes of these choices from the Vote table.
+
+        Returns the number of choices whose counter was out of step.
+        """
+        return self.filter(pk__in=self.drifted().values("pk")) \
+            .update(votes=self._actual_votes())
+
 
 class Choice(models.Model):
     """
@@ -48,11 +134,11 @@ class Choice(models.Model):
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    # Denormalized number of votes, kept in step with the Vote table by
+    # the vote and unvote views. Use `reconcile_votes` to rebuild it.
+    votes = models.PositiveIntegerField(default=0)
 
-    @property
-    def votes(self):
-        """Return the vote of this choice."""
-        return self.vote_set.count()
+    objects = ChoiceQuerySet.as_manager()
 
     def __str__(self):
         """Return the choice's text."""
@@ -63,8 +149,28 @@ class Vote(models.Model):
     """
     A vote by the user to a choice in the poll.
 
-    There can be many votes to one choice.
+    There can be many votes to one choice, but only one vote per user
+    to each question.
     """
 
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        """Allow one vote per user to each question."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "question"], name="one_vote_per_question"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["question", "choice"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Save the vote, taking its question from the chosen choice."""
+        if self.question_id is None:
+            self.question_id = self.choice.question_id
+        super().save(*args, **kwargs)
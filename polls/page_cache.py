@@ -0,0 +1,184 @@
+"""Cache whole pages for anonymous visitors and answer conditional GETs.
+
+An anonymous index or results page is the same for every visitor, so
+it is rendered once per version of what it shows and then served from
+the cache. Each page's key is built from what its content depends on:
+
+* the index, from the content version, which is bumped whenever a
+  question or choice is saved or deleted, and whenever a question opens
+  or closes (see `polls.lifecycle`);
+* the results, from the question's results version (see
+  `polls.results`) and the content version.
+
+A cached page carries an ETag, derived from its key, and the time it
+was rendered as Last-Modified, so browsers revalidating it get a 304.
+Signed-in visitors, and anonymous ones with messages to show, get a
+freshly rendered page; its unpersonalized parts are cached as template
+fragments under the same keys.
+"""
+
+import hashlib
+import time
+from collections import Counter
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .instrumentation import rendering
+from .models import Choice, Question
+from .results import aget_version, get_version
+
+_VERSION_KEY = "polls:pages:version"
+
+_stats = Counter()
+
+
+def content_version():
+    """Return the version of the questions' and choices' content."""
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(_VERSION_KEY)
+    return version
+
+
+async def acontent_version():
+    """Return `content_version()`, using the async cache API."""
+    version = await cache.aget(_VERSION_KEY)
+    if version is None:
+        await cache.aadd(_VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(_VERSION_KEY)
+    return version
+
+
+def bump_content_version():
+    """Invalidate every cached page."""
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=Choice)
+def content_changed(sender, **kwargs):
+    """Invalidate the cached pages when a question or choice changes."""
+    bump_content_version()
+
+
+def index_key(cursor=None):
+    """Return the cache key of an index page."""
+    return f"index:{content_version()}:{cursor or ''}"
+
+
+async def aindex_key(cursor=None):
+    """Return `index_key(cursor)`, using the async cache API."""
+    return f"index:{await acontent_version()}:{cursor or ''}"
+
+
+def results_key(question_id):
+    """Return the cache key of a question's results page."""
+    return f"results:{question_id}:{get_version(question_id)}:" \
+           f"{content_version()}"
+
+
+async def aresults_key(question_id):
+    """Return the cache key of a question's live-updating results page.
+
+    The async views' page subscribes to the live results stream, so it
+    is cached apart from the sync views' page.
+    """
+    return f"live-results:{question_id}:{await aget_version(question_id)}:" \
+           f"{await acontent_version()}"
+
+
+def cacheable(request):
+    """Tell whether the request can be answered with a shared page."""
+    return (request.method in ("GET", "HEAD")
+            and not request.user.is_authenticated
+            and not len(messages.get_messages(request)))
+
+
+def _digest(key):
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def _entry(response):
+    if hasattr(response, "render"):
+        with rendering():
+            response.render()
+    return {
+        "content": response.content,
+        "content_type": response["Content-Type"],
+        "last_modified": time.time(),
+    }
+
+
+def _respond(request, digest, entry):
+    etag = f'"{digest}"'
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(entry["last_modified"]))
+    if response is None:
+        response = HttpResponse(entry["content"],
+                                content_type=entry["content_type"])
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(entry["last_modified"])
+    return response
+
+
+def serve(request, key, render):
+    """Answer the request with the page cached under `key`.
+
+    Args:
+        request: an anonymous GET or HEAD request
+        key: the page's key, from `index_key` or `results_key`
+        render: a function returning the freshly rendered page, called
+            when the page isn't cached; responses other than 200 are
+            returned as they are
+    """
+    digest = _digest(key)
+    entry = cache.get(f"polls:page:{digest}")
+    if entry is None:
+        _stats["misses"] += 1
+        response = render()
+        if response.status_code != 200:
+            return response
+        entry = _entry(response)
+        cache.set(f"polls:page:{digest}", entry,
+                  timeout=settings.PAGE_CACHE_TIMEOUT)
+    else:
+        _stats["hits"] += 1
+    return _respond(request, digest, entry)
+
+
+async def aserve(request, key, render):
+    """Do `serve(request, key, render)` with an async `render`."""
+    digest = _digest(key)
+    entry = await cache.aget(f"polls:page:{digest}")
+    if entry is None:
+        _stats["misses"] += 1
+        response = await render()
+        if response.status_code != 200:
+            return response
+        entry = _entry(response)
+        await cache.aset(f"polls:page:{digest}", entry,
+                         timeout=settings.PAGE_CACHE_TIMEOUT)
+    else:
+        _stats["hits"] += 1
+    return _respond(request, digest, entry)
+
+
+def page_stats():
+    """Return the hit and miss counters of the page cache."""
+    hits, misses = _stats["hits"], _stats["misses"]
+    reads = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / reads, 3) if reads else 0.0,
+    }
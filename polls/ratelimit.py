@@ -0,0 +1,296 @@
+"""Limit how fast clients may sign in and vote.
+
+Failed sign-ins are counted in the cache over a sliding window, one
+counter per IP address and one per username. Once either reaches its
+limit, `LoginThrottleBackend` refuses the next attempts before any
+backend hashes the password, so a burst of guesses costs a couple of
+cache reads each instead of a PBKDF2 hash. The window slides by
+weighting the previous fixed window's count by how much of it still
+overlaps the last `LOGIN_WINDOW` seconds, so only two counters are kept
+per key. Like every cache-backed limit, it is only shared by all
+workers when the cache is, and only counted exactly by a cache that
+increments atomically, i.e. Redis or Memcached.
+
+Views decorated with `rate_limited(route)` count each request in the
+same kind of window, one per IP address and one per signed-in user, as
+set in `settings.RATE_LIMITS[route]`, and answer 429 when either is
+full. A request refused per IP is answered before its session or user
+is loaded.
+"""
+
+import functools
+import hashlib
+import math
+import threading
+import time
+from collections import Counter
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth import user_logged_in, user_login_failed
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+_stats = Counter()
+
+_route_stats = Counter()
+
+# Seconds in each period a rate may be given per.
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def get_client_ip(request):
+    """Get the visitor’s IP address using request headers.
+
+    X-Forwarded-For is only read behind `settings.TRUSTED_PROXIES`
+    proxies, and then only the address the outermost of them added:
+    whatever the client sent is further left and may be made up.
+    """
+    if request:
+        ip = request.META.get("REMOTE_ADDR")
+        proxies = settings.TRUSTED_PROXIES
+        x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+        if proxies and x_forwarded_for:
+            hops = [hop.strip() for hop in x_forwarded_for.split(",")]
+            if len(hops) >= proxies:
+                ip = hops[-proxies]
+        return ip
+    return None
+
+
+class SlidingWindow:
+    """Count events per key over the last `window` seconds."""
+
+    def __init__(self, scope, limit, window):
+        """Allow `limit` events per key of this scope in `window` seconds."""
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _keys(self, key, now):
+        """Return the current and previous counters' keys, and the overlap.
+
+        The overlap is how much of the previous fixed window is still in
+        the sliding one.
+        """
+        digest = hashlib.sha256(str(key).encode()).hexdigest()[:32]
+        period, offset = divmod(now, self.window)
+        prefix = f"polls:ratelimit:{self.scope}:{digest}"
+        return (f"{prefix}:{int(period)}", f"{prefix}:{int(period) - 1}",
+                1 - offset / self.window)
+
+    def count(self, key, now=None):
+        """Return the number of events of `key` in the window."""
+        current, previous, overlap = self._keys(key, now or time.time())
+        counts = cache.get_many([current, previous])
+        return counts.get(current, 0) + counts.get(previous, 0) * overlap
+
+    def exceeded(self, key, now=None):
+        """Tell whether `key` has used up its events."""
+        return self.count(key, now) >= self.limit
+
+    def hit(self, key, now=None):
+        """Count an event of `key`."""
+        current, _, _ = self._keys(key, now or time.time())
+        self._incr(current)
+
+    def _incr(self, counter):
+        """Add one to a counter, returning its new count."""
+        cache.add(counter, 0, timeout=2 * self.window)
+        try:
+            return cache.incr(counter)
+        except ValueError:
+            # Evicted between add() and incr().
+            cache.set(counter, 1, timeout=2 * self.window)
+            return 1
+
+    def take(self, key, now=None):
+        """Count an event of `key` if the window has room for it.
+
+        Returns 0, or about how many seconds until there is room. The
+        count is incremented before it is checked, and a refused event is
+        taken back. On Redis and Memcached, whose increments are atomic,
+        concurrent events can't both take the last place; the other
+        backends increment with a read and a write, so under contention
+        a few events more than the limit may get through.
+        """
+        current, previous, overlap = self._keys(key, now or time.time())
+        count = self._incr(current)
+        earlier = cache.get(previous, 0)
+        if count + earlier * overlap <= self.limit:
+            return 0
+        try:
+            cache.decr(current)
+        except ValueError:
+            pass
+        # Wait until the previous window overlaps little enough.
+        room = max(0, self.limit - count) / earlier if earlier else 0
+        return self.window * (overlap - room)
+
+    def reset(self, key, now=None):
+        """Forget the events of `key`."""
+        current, previous, _ = self._keys(key, now or time.time())
+        cache.delete_many([current, previous])
+
+
+def _windows():
+    """Return the per-IP and per-username windows of failed sign-ins."""
+    return (SlidingWindow("login:ip", settings.LOGIN_FAILURES_PER_IP,
+                          settings.LOGIN_WINDOW),
+            SlidingWindow("login:username",
+                          settings.LOGIN_FAILURES_PER_USERNAME,
+                          settings.LOGIN_WINDOW))
+
+
+def login_throttled(request, username):
+    """Tell whether to refuse a sign-in without checking the password.
+
+    A refused request is marked, so the failure it becomes isn't counted
+    again and can't keep extending the lockout.
+    """
+    by_ip, by_username = _windows()
+    ip_addr = get_client_ip(request)
+    reason = None
+    if ip_addr and by_ip.exceeded(ip_addr):
+        reason = "ip"
+    elif username and by_username.exceeded(username):
+        reason = "username"
+    if reason is None:
+        _stats["allowed"] += 1
+        return False
+    _stats[f"refused_{reason}"] += 1
+    if request is not None:
+        request.login_throttled = True
+    return True
+
+
+@receiver(user_login_failed)
+def count_failure(sender, credentials, request=None, **kwargs):
+    """Count a failed sign-in against its IP address and username."""
+    if getattr(request, "login_throttled", False):
+        return
+    _stats["failures"] += 1
+    by_ip, by_username = _windows()
+    ip_addr = get_client_ip(request)
+    if ip_addr:
+        by_ip.hit(ip_addr)
+    if credentials.get("username"):
+        by_username.hit(credentials["username"])
+
+
+@receiver(user_logged_in)
+def forget_failures(sender, request, user, **kwargs):
+    """Clear the failures of a username that signed in."""
+    _windows()[1].reset(user.get_username())
+
+
+def login_stats():
+    """Return the sign-in attempts allowed, refused and failed so far."""
+    return {
+        "allowed": _stats["allowed"],
+        "refused_ip": _stats["refused_ip"],
+        "refused_username": _stats["refused_username"],
+        "failures": _stats["failures"],
+    }
+
+
+def parse_rate(rate):
+    """Return the count and the seconds of a "N/period" rate.
+
+    The period is s, m, h or d, optionally with a count, as in "5/10s".
+    """
+    count, _, period = rate.partition("/")
+    multiple = period[:-1] or "1"
+    if not (count.isdigit() and multiple.isdigit()
+            and period[-1:] in PERIODS):
+        raise ValueError(f"Invalid rate {rate!r}, expected e.g. '30/m'.")
+    return int(count), int(multiple) * PERIODS[period[-1]]
+
+
+_windows_by_route = {}
+
+_windows_lock = threading.Lock()
+
+
+def _route_windows(route):
+    """Return the per-IP and per-user windows of a route, or None each."""
+    windows = _windows_by_route.get(route)
+    if windows is None:
+        limits = settings.RATE_LIMITS.get(route, {})
+        windows = tuple(
+            SlidingWindow(f"{route}:{scope}", *parse_rate(limits[scope]))
+            if limits.get(scope) else None
+            for scope in ("ip", "user")
+        )
+        with _windows_lock:
+            windows = _windows_by_route.setdefault(route, windows)
+    return windows
+
+
+@receiver(setting_changed)
+def rate_limits_changed(sender, setting, **kwargs):
+    """Start over with new windows when RATE_LIMITS changes."""
+    if setting == "RATE_LIMITS":
+        _windows_by_route.clear()
+
+
+def too_many_requests(wait):
+    """Return a plain 429 response asking to retry in `wait` seconds."""
+    response = HttpResponse("Too many requests, slow down.\n", status=429,
+                            content_type="text/plain")
+    response["Retry-After"] = str(math.ceil(wait))
+    return response
+
+
+def _check_ip(route, request):
+    """Count the request against its IP, returning 0 or seconds to wait."""
+    by_ip, _ = _route_windows(route)
+    ip_addr = get_client_ip(request)
+    return by_ip.take(ip_addr) if by_ip and ip_addr else 0
+
+
+def _check_user(route, user):
+    """Count the request against its user, returning 0 or seconds to wait."""
+    _, by_user = _route_windows(route)
+    return by_user.take(user.pk) if by_user and user.is_authenticated else 0
+
+
+def _count(route, wait):
+    """Count a request to a route as allowed or limited."""
+    _route_stats[f"{route} {'limited' if wait else 'allowed'}"] += 1
+
+
+def rate_limited(route):
+    """Limit a view, sync or async, with the windows of `route`."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                wait = _check_ip(route, request)
+                if not wait and _route_windows(route)[1]:
+                    wait = _check_user(route, await request.auser())
+                _count(route, wait)
+                if wait:
+                    return too_many_requests(wait)
+                return await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                wait = (_check_ip(route, request)
+                        or _check_user(route, request.user))
+                _count(route, wait)
+                if wait:
+                    return too_many_requests(wait)
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def rate_limit_stats():
+    """Return the requests allowed and limited so far, per route."""
+    stats = {}
+    for name, count in _route_stats.items():
+        route, outcome = name.split()
+        stats.setdefault(route, {"allowed": 0, "limited": 0})[outcome] = count
+    return stats
@@ -0,0 +1,129 @@
+"""Compute the results of a poll."""
+
+import time
+from collections import Counter
+from django.core.cache import cache
+
+from .models import Choice
+
+# How long a results snapshot may stay in the cache, in seconds.
+RESULTS_TIMEOUT = 60 * 60
+
+_stats = Counter()
+
+
+def tally(question_id):
+    """Return the vote totals of a question's choices in one query.
+
+    The totals come from the denormalized `Choice.votes` counters, so no
+    aggregation over the Vote table is needed. The result is a plain dict
+    with the total number of votes, and one row per choice holding its
+    text, votes, share of the total in percent and whether it leads.
+    """
+    return _summarize(list(_choice_rows(question_id)))
+
+
+async def atally(question_id):
+    """Return `tally(question_id)`, querying the database asynchronously."""
+    return _summarize([row async for row in _choice_rows(question_id)])
+
+
+def _choice_rows(question_id):
+    return Choice.objects.filter(question_id=question_id) \
+        .order_by("pk").values_list("pk", "choice_text", "votes")
+
+
+def _summarize(rows):
+    total = sum(votes for _, _, votes in rows)
+    top = max((votes for _, _, votes in rows), default=0)
+    choices = []
+    for pk, text, votes in rows:
+        choices.append({
+            "id": pk,
+            "text": text,
+            "votes": votes,
+            "percent": round(100 * votes / total, 1) if total else 0.0,
+            "leading": 0 < top == votes,
+        })
+    return {
+        "total": total,
+        "choices": choices,
+        "leaders": [choice for choice in choices if choice["leading"]],
+    }
+
+
+def _version_key(question_id):
+    return f"polls:results:version:{question_id}"
+
+
+def get_version(question_id):
+    """Return the current results version of a question.
+
+    A version that was evicted from the cache is replaced by a fresh,
+    time-based one, so it can never match an older snapshot.
+    """
+    key = _version_key(question_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(question_id):
+    """Return `get_version(question_id)`, using the async cache API."""
+    key = _version_key(question_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(question_id):
+    """Invalidate the cached results of a question.
+
+    Call this once the vote changes are committed. Live result streams
+    notice the new version and push the new results.
+    """
+    try:
+        cache.incr(_version_key(question_id))
+    except ValueError:
+        cache.set(_version_key(question_id), time.time_ns(), timeout=None)
+
+
+def cached_tally(question_id):
+    """Return `tally(question_id)`, reading it from the cache if possible."""
+    key = f"polls:results:{question_id}:{get_version(question_id)}"
+    results = cache.get(key)
+    if results is None:
+        _stats["misses"] += 1
+        results = tally(question_id)
+        cache.set(key, results, timeout=RESULTS_TIMEOUT)
+    else:
+        _stats["hits"] += 1
+    return results
+
+
+async def acached_tally(question_id):
+    """Return `await atally(question_id)`, from the cache if possible."""
+    key = f"polls:results:{question_id}:{await aget_version(question_id)}"
+    results = await cache.aget(key)
+    if results is None:
+        _stats["misses"] += 1
+        results = await atally(question_id)
+        await cache.aset(key, results, timeout=RESULTS_TIMEOUT)
+    else:
+        _stats["hits"] += 1
+    return results
+
+
+def cache_stats():
+    """Return the hit and miss counters of the results cache."""
+    hits, misses = _stats["hits"], _stats["misses"]
+    reads = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / reads, 3) if reads else 0.0,
+    }
@@ -0,0 +1,54 @@
+"""Fire bursts of concurrent votes at the database."""
+
+import random
+import threading
+import time
+from django.db import connection
+
+from .voting import cast_vote
+
+
+def vote_burst(users, choices, submissions=1, workers=16, cast=cast_vote):
+    """Let every user submit votes at the same moment from a thread pool.
+
+    Each user votes `submissions` times, each time for a random choice,
+    and the votes are spread over `workers` threads that start together.
+    Each vote is cast by calling `cast(user, choice)`.
+
+    Returns:
+        a dict with the number of votes cast, the failed votes, the
+        elapsed seconds and the throughput in votes per second.
+    """
+    tasks = [(user, random.choice(choices))
+             for user in users for _ in range(submissions)]
+    random.shuffle(tasks)
+    workers = max(1, min(workers, len(tasks)))
+    start = threading.Barrier(workers + 1)
+    errors = []
+
+    def work(chunk):
+        start.wait()
+        try:
+            for user, choice in chunk:
+                try:
+                    cast(user, choice)
+                except Exception as error:
+                    errors.append(error)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=work, args=(tasks[n::workers],))
+               for n in range(workers)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - began
+    return {
+        "votes": len(tasks) - len(errors),
+        "errors": errors,
+        "seconds": seconds,
+        "votes_per_sec": (len(tasks) - len(errors)) / seconds,
+    }
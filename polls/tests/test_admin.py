@@ -0,0 +1,110 @@
+"""Test the admin pages of the poll application."""
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from polls.admin import EstimatedCountPaginator
+from polls.models import Choice, Question, Vote
+from polls.voting import cast_vote
+
+
+class AdminTests(TestCase):
+    """Test the question, choice and vote changelists."""
+
+    def setUp(self):
+        """Sign in a superuser and create questions with votes."""
+        self.admin = User.objects.create_superuser("admin")
+        self.client.force_login(self.admin)
+        self.question = Question.objects.create(question_text="Admin poll")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+        for n in range(3):
+            user = User.objects.create_user(username=f"voter{n}")
+            cast_vote(user, self.choice)
+
+    def test_question_changelist(self):
+        """Questions are listed with their total votes."""
+        response = self.client.get(
+            reverse("admin:polls_question_changelist"))
+        self.assertEqual(response.context["cl"].result_list[0].total_votes,
+                         3)
+
+    def test_question_shows_choices(self):
+        """A question's page edits its choices inline."""
+        response = self.client.get(
+            reverse("admin:polls_question_change", args=(self.question.id,)))
+        self.assertContains(response, "Yes")
+
+    def test_changelist_queries_do_not_grow(self):
+        """Listing more rows doesn't take more queries."""
+        urls = [reverse(f"admin:polls_{model}_changelist")
+                for model in ("question", "choice", "vote")]
+        counts = []
+        for _ in range(2):
+            question = Question.objects.create(question_text="More")
+            choice = Choice.objects.create(question=question,
+                                           choice_text="No")
+            cast_vote(User.objects.create_user(f"voter-{choice.id}"), choice)
+            counts.append([self.query_count(url) for url in urls])
+        self.assertEqual(counts[0], counts[1])
+
+    def query_count(self, url):
+        """Return how many queries a page takes."""
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(captured)
+
+    def test_votes_are_read_only(self):
+        """Votes can't be added or edited in the admin."""
+        response = self.client.get(reverse("admin:polls_vote_add"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_delete_votes(self):
+        """Deleting votes in the admin updates the choices' counters."""
+        votes = Vote.objects.filter(user__username__in=["voter0", "voter1"])
+        self.client.post(reverse("admin:polls_vote_changelist"), {
+            "action": "delete_selected", "post": "yes",
+            "_selected_action": list(votes.values_list("pk", flat=True)),
+        })
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.votes, 1)
+        self.assertEqual(Vote.objects.count(), 1)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """Test counting pages from the planner's estimate."""
+
+    def setUp(self):
+        """Create a few questions."""
+        for n in range(3):
+            Question.objects.create(question_text=f"Question {n}")
+
+    def test_exact_without_estimate(self):
+        """Without an estimate, e.g. on SQLite, rows are counted."""
+        paginator = EstimatedCountPaginator(Question.objects.order_by("pk"), 2)
+        self.assertEqual(paginator.count, 3)
+
+    @mock.patch.object(EstimatedCountPaginator, "estimate",
+                       return_value=250_000)
+    def test_estimate_of_large_table(self, estimate):
+        """A large table's estimate is used for the whole table only."""
+        questions = Question.objects.order_by("pk")
+        paginator = EstimatedCountPaginator(questions, 100)
+        self.assertEqual(paginator.count, 250_000)
+        self.assertEqual(paginator.num_pages, 2_500)
+        filtered = Question.objects.filter(question_text="Question 1") \
+            .order_by("pk")
+        self.assertEqual(EstimatedCountPaginator(filtered, 100).count, 1)
+
+    @mock.patch.object(EstimatedCountPaginator, "estimate",
+                       return_value=120)
+    def test_small_table_counted(self, estimate):
+        """A small table is counted exactly."""
+        questions = Question.objects.order_by("pk")
+        paginator = EstimatedCountPaginator(questions, 100)
+        self.assertEqual(paginator.count, 3)
@@ -0,0 +1,99 @@
+"""Test the async views of the poll application."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncClient, SimpleTestCase, TestCase, \
+    override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question, Vote
+
+
+@override_settings(ROOT_URLCONF="mysite.async_urls")
+class AsyncViewTests(TestCase):
+    """Test the async views through the ASGI handler."""
+
+    def setUp(self):
+        """Create a question with two choices and a voter."""
+        cache.clear()
+        self.question = Question.objects.create(question_text="Async poll")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        self.user = User.objects.create_user(username="voter")
+
+    async def test_index(self):
+        """The index lists published questions with their status."""
+        future = timezone.now() + datetime.timedelta(days=1)
+        await Question.objects.acreate(question_text="Future",
+                                       pub_date=future)
+        response = await self.async_client.get(reverse("polls:index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context["latest_question_list"]),
+                         [self.question])
+        self.assertContains(response, "Status : Open")
+
+    async def test_detail_marks_vote(self):
+        """The detail page marks the choice the user voted for."""
+        await Vote.objects.acreate(user=self.user, choice=self.choice2,
+                                   question=self.question)
+        await self.async_client.aforce_login(self.user)
+        url = reverse("polls:detail", args=(self.question.id,))
+        response = await self.async_client.get(url)
+        self.assertEqual(response.context["marked_choice"], self.choice2)
+
+    async def test_detail_of_future_question(self):
+        """A question that isn't published redirects to the index."""
+        future = timezone.now() + datetime.timedelta(days=1)
+        question = await Question.objects.acreate(question_text="Future",
+                                                  pub_date=future)
+        url = reverse("polls:detail", args=(question.id,))
+        response = await self.async_client.get(url)
+        self.assertRedirects(response, reverse("polls:index"),
+                             fetch_redirect_response=False)
+
+    async def test_vote_unvote_and_results(self):
+        """Votes cast through the async views show up in the results."""
+        await self.async_client.aforce_login(self.user)
+        vote_url = reverse("polls:vote", args=(self.question.id,))
+        response = await self.async_client.post(
+            vote_url, {"choice": self.choice1.id})
+        self.assertRedirects(
+            response, reverse("polls:results", args=(self.question.id,)),
+            fetch_redirect_response=False)
+        response = await self.async_client.get(response.url)
+        self.assertEqual(response.context["results"]["total"], 1)
+        self.assertEqual(await Vote.objects.filter(user=self.user).acount(),
+                         1)
+        unvote_url = reverse("polls:unvote", args=(self.question.id,))
+        await self.async_client.post(unvote_url)
+        self.assertEqual(await Vote.objects.filter(user=self.user).acount(),
+                         0)
+
+    async def test_vote_requires_login(self):
+        """Anonymous votes are redirected to the login page."""
+        vote_url = reverse("polls:vote", args=(self.question.id,))
+        response = await self.async_client.post(
+            vote_url, {"choice": self.choice1.id})
+        self.assertRedirects(response, f"{reverse('login')}?next={vote_url}",
+                             fetch_redirect_response=False)
+
+
+@override_settings(ROOT_URLCONF="mysite.async_urls", DEBUG=True)
+class AsyncStaticFilesTests(SimpleTestCase):
+    """Test serving static files under ASGI."""
+
+    def test_middleware_stays_async(self):
+        """No middleware makes the async handler hop to a thread."""
+        with self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
+
+    async def test_static_file(self):
+        """Static files are served by the async middleware chain."""
+        response = await AsyncClient().get("/static/polls/style.css")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/css"))
@@ -140,6 +140,8 @@ class UserAuthTest(django.test.TestCase):
         self.client.post(self.vote_url, form_data_before)
         self.client.post(self.vote_url, form_data_after)
         vote_object = choice_after.vote_set.get(user=self.user1)
+        choice_before.refresh_from_db()
+        choice_after.refresh_from_db()
         self.assertEqual(choice_before.votes, 0)
         self.assertEqual(choice_after.votes, 1)
         self.assertEqual(vote_object.user, self.user1)
@@ -156,6 +158,7 @@ class UserAuthTest(django.test.TestCase):
             self.client.post(self.vote_url, form_data)
         vote_object = choice.vote_set.get(user=self.user1)
         self.assertEqual(vote_object.user, self.user1)
+        choice.refresh_from_db()
         self.assertEqual(choice.votes, 1)
 
     def test_user_can_delete_vote(self):
@@ -172,3 +175,18 @@ class UserAuthTest(django.test.TestCase):
         unvote_url = reverse("polls:unvote", args=[self.question.id])
         self.client.post(unvote_url)
         self.assertEqual(choice.vote_set.filter(user=self.user1).count(), 0)
+
+    def test_delete_vote_updates_counter(self):
+        """Deleting a vote takes it off the choice's vote counter."""
+        choice = self.question.choice_set.first()
+        self.assertTrue(
+            self.client.login(username=self.username, password=self.password)
+        )
+
+        self.client.post(self.vote_url, {"choice": f"{choice.id}"})
+        choice.refresh_from_db()
+        self.assertEqual(choice.votes, 1)
+        unvote_url = reverse("polls:unvote", args=[self.question.id])
+        self.client.post(unvote_url)
+        choice.refresh_from_db()
+        self.assertEqual(choice.votes, 0)
@@ -0,0 +1,125 @@
+"""Test the write-behind vote buffer."""
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from polls.buffer import VoteBuffer, get_buffer
+from polls.models import Choice, Question, Vote
+
+
+class VoteBufferTests(TestCase):
+    """Test voting with the buffer on."""
+
+    def setUp(self):
+        """Point the buffer at a fresh file and create a poll."""
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "buffer.sqlite3")
+        settings = override_settings(VOTE_BUFFER=True, VOTE_BUFFER_PATH=path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.buffer = get_buffer()
+        self.question = Question.objects.create(question_text="Buffered")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        self.user = User.objects.create_user(username="voter")
+        self.client.force_login(self.user)
+        self.vote_url = reverse("polls:vote", args=(self.question.id,))
+        self.detail_url = reverse("polls:detail", args=(self.question.id,))
+
+    def test_read_your_own_vote(self):
+        """A queued vote shows on the user's page before it is flushed."""
+        self.client.post(self.vote_url, {"choice": self.choice2.id})
+        self.assertFalse(Vote.objects.exists())
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.context["marked_choice"], self.choice2)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(Vote.objects.get().choice, self.choice2)
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice2.votes, 1)
+
+    def test_flush_keeps_last_intent(self):
+        """Intents are coalesced per user and question."""
+        for choice in [self.choice1, self.choice2, self.choice1]:
+            self.client.post(self.vote_url, {"choice": choice.id})
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(Vote.objects.get().choice, self.choice1)
+        self.assertEqual(self.buffer.backlog(), 0)
+        self.assertEqual(self.buffer.stats()["applied"], 1)
+
+    def test_unvote(self):
+        """A queued unvote deletes the flushed vote."""
+        self.client.post(self.vote_url, {"choice": self.choice1.id})
+        self.buffer.flush()
+        unvote_url = reverse("polls:unvote", args=(self.question.id,))
+        self.client.post(unvote_url)
+        response = self.client.get(self.detail_url)
+        self.assertNotIn("marked_choice", response.context)
+        # A second unvote is refused, as the queued one already counts.
+        response = self.client.post(unvote_url)
+        self.assertRedirects(response, self.detail_url)
+        self.buffer.flush()
+        self.assertFalse(Vote.objects.exists())
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+
+    def test_appends_are_synced(self):
+        """Every committed append is synced to disk, not only the log."""
+        synchronous = self.buffer.connection.execute(
+            "PRAGMA synchronous").fetchone()[0]
+        self.assertEqual(synchronous, 2)  # FULL
+
+    def test_flush_needs_a_batch(self):
+        """A batch size below 1 is refused instead of flushing nothing."""
+        with self.assertRaisesMessage(CommandError, "at least 1"):
+            call_command("flush_votes", "--batch-size", "0",
+                         stdout=StringIO())
+
+
+class DeadLetterTests(TransactionTestCase):
+    """Test flushing intents the database rejects."""
+
+    def setUp(self):
+        """Point the buffer at a fresh file and create a poll."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "buffer.sqlite3")
+        self.buffer = VoteBuffer(self.path)
+        self.question = Question.objects.create(question_text="Buffered")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="One")
+        self.users = [User.objects.create_user(username=f"voter{n}")
+                      for n in range(2)]
+
+    def test_bad_intent_does_not_block_the_rest(self):
+        """A rejected intent is set aside and the others are applied."""
+        self.buffer.append(self.users[0].id, self.question.id, self.choice.id)
+        self.buffer.append(self.users[1].id, self.question.id, 999_999)
+        self.buffer.append(self.users[1].id + 1000, self.question.id,
+                           self.choice.id)
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.buffer.backlog(), 0)
+        self.assertEqual(Vote.objects.get().user, self.users[0])
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.votes, 1)
+        dead = self.buffer.dead_letters()
+        self.assertEqual([row[:3] for row in dead], [
+            (self.users[1].id, self.question.id, 999_999),
+            (self.users[1].id + 1000, self.question.id, self.choice.id),
+        ])
+
+    def test_stats_are_shared(self):
+        """Every process reports the flushes, whoever did them."""
+        self.buffer.append(self.users[0].id, self.question.id, self.choice.id)
+        self.buffer.flush()
+        stats = VoteBuffer(self.path).stats()
+        self.assertEqual((stats["flushes"], stats["applied"]), (1, 1))
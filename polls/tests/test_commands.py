@@ -0,0 +1,159 @@
+"""Test the management commands of the polls application."""
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from polls import results
+from polls.models import Choice, Question, Vote
+
+
+class ReconcileVotesTests(TestCase):
+    """Test the reconcile_votes command."""
+
+    def setUp(self):
+        """Create a question whose counters have drifted."""
+        cache.clear()
+        self.question = Question.objects.create(question_text="Drifted")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One", votes=7)
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        for n in range(3):
+            user = User.objects.create_user(username=f"voter{n}")
+            Vote.objects.create(user=user, choice=self.choice2)
+
+    def test_reconcile_fixes_counters(self):
+        """Counters are recounted from the Vote table."""
+        out = StringIO()
+        call_command("reconcile_votes", stdout=out)
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+        self.assertEqual(self.choice2.votes, 3)
+        self.assertIn("fixed 2 choice(s)", out.getvalue())
+
+    def test_reconcile_refreshes_cached_results(self):
+        """Cached results of the reconciled question are invalidated."""
+        self.assertEqual(results.cached_tally(self.question.id)["total"], 7)
+        call_command("reconcile_votes", stdout=StringIO())
+        self.assertEqual(results.cached_tally(self.question.id)["total"], 3)
+
+    def test_reconcile_only_given_questions(self):
+        """Choices of other questions are left alone."""
+        other = Question.objects.create(question_text="Other")
+        call_command("reconcile_votes", other.id, stdout=StringIO())
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 7)
+
+
+class BenchmarkQueriesTests(TestCase):
+    """Test the benchmark_queries command."""
+
+    def test_benchmark_leaves_no_data(self):
+        """The seeded questions are rolled back after the benchmark."""
+        out = StringIO()
+        call_command("benchmark_queries", questions=20, repeat=2, stdout=out)
+        self.assertIn("index query", out.getvalue())
+        self.assertIn("results:", out.getvalue())
+        self.assertFalse(Question.objects.exists())
+
+    def test_nothing_to_benchmark(self):
+        """Without a published question with choices, it says so."""
+        with self.assertRaisesMessage(CommandError, "no published question"):
+            call_command("benchmark_queries", questions=5, choices=0,
+                         stdout=StringIO())
+        self.assertFalse(Question.objects.exists())
+
+
+class BenchServingTests(TestCase):
+    """Test the entrypoint benchmark."""
+
+    def test_leaves_configured_database_alone(self):
+        """Without PostgreSQL to make a throwaway database, it refuses."""
+        if connection.vendor == "postgresql":
+            self.skipTest("Would start the servers.")
+        Question.objects.create(question_text="Real data")
+        with self.assertRaisesMessage(CommandError, "needs PostgreSQL"):
+            call_command("bench_serving", stdout=StringIO())
+        self.assertEqual(Question.objects.get().question_text, "Real data")
+        self.assertFalse(User.objects.exists())
+
+
+class BenchSessionsTests(TestCase):
+    """Test the bench_sessions command."""
+
+    def test_benchmark_leaves_no_data(self):
+        """Every mode is reported and the voter is rolled back."""
+        out = StringIO()
+        call_command("bench_sessions", requests=2, stdout=out)
+        self.assertEqual(out.getvalue().count("queries"), 6)
+        self.assertIn("signed_cookies sessions, cached user", out.getvalue())
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Question.objects.exists())
+
+
+class SeedPollsTests(TestCase):
+    """Test the seed_polls command."""
+
+    def test_seed_respects_one_vote_per_question(self):
+        """The generated votes are unique per user and question."""
+        out = StringIO()
+        call_command("seed_polls", users=10, questions=3, choices=2, votes=25,
+                     batch_size=4, stdout=out)
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Question.objects.count(), 3)
+        self.assertEqual(Choice.objects.count(), 6)
+        self.assertEqual(Vote.objects.count(), 25)
+        self.assertEqual(sum(Choice.objects.values_list("votes", flat=True)),
+                         25)
+        self.assertIn("rows/sec", out.getvalue())
+
+    def test_too_many_votes(self):
+        """More votes than user and question pairs is refused."""
+        with self.assertRaises(CommandError):
+            call_command("seed_polls", users=2, questions=2, votes=5,
+                         stdout=StringIO())
+
+    def test_needs_a_choice(self):
+        """Questions without choices are refused before generating any."""
+        with self.assertRaisesMessage(CommandError, "at least 1"):
+            call_command("seed_polls", "--choices", "0", stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+
+
+class BenchConnectionsTests(TestCase):
+    """Test the bench_connections command."""
+
+    def test_compares_modes(self):
+        """Each way of connecting is timed, on PostgreSQL only."""
+        out = StringIO()
+        if connection.vendor != "postgresql":
+            with self.assertRaises(CommandError):
+                call_command("bench_connections", stdout=out)
+            return
+        call_command("bench_connections", requests=5, stdout=out)
+        self.assertIn("new connection", out.getvalue())
+        self.assertIn("persistent", out.getvalue())
+
+
+class LoadDemoDataTests(TestCase):
+    """Test the load_demo_data command."""
+
+    def test_loads_once(self):
+        """The fixtures load into an empty database, and only then."""
+        call_command("load_demo_data", stdout=StringIO())
+        self.assertTrue(Question.objects.exists())
+        self.assertFalse(Question.objects.filter(
+            status=Question.Status.SCHEDULED, pub_date__lte=timezone.now(),
+        ).exists())
+        votes = Vote.objects.count()
+        out = StringIO()
+        with self.assertNumQueries(1):
+            call_command("load_demo_data", stdout=out)
+        self.assertIn("skipped", out.getvalue())
+        self.assertEqual(Vote.objects.count(), votes)
@@ -0,0 +1,90 @@
+"""Test exporting poll results and votes."""
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.models import Choice, Question, Vote
+
+
+class ExportTests(TestCase):
+    """Test the export endpoint and command."""
+
+    def setUp(self):
+        """Create a question with votes and a staff member."""
+        self.question = Question.objects.create(question_text="Export me")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One", votes=2)
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two", votes=1)
+        for n, choice in enumerate([self.choice1, self.choice1,
+                                    self.choice2]):
+            user = User.objects.create_user(username=f"voter{n}")
+            Vote.objects.create(user=user, choice=choice)
+        self.staff = User.objects.create_user(username="staff",
+                                              is_staff=True)
+        self.url = reverse("polls:export", args=(self.question.id,))
+
+    def content(self, response):
+        """Return the body of a streaming response."""
+        return b"".join(response.streaming_content).decode()
+
+    def test_staff_only(self):
+        """Users who aren't staff can't export."""
+        self.client.force_login(User.objects.get(username="voter0"))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_results_csv(self):
+        """The results are streamed as CSV by default."""
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = self.content(response).splitlines()
+        self.assertEqual(lines[0], "question_id,question_text,choice_id,"
+                                   "choice_text,votes")
+        self.assertEqual(lines[1], f"{self.question.id},Export me,"
+                                   f"{self.choice1.id},One,2")
+        self.assertEqual(len(lines), 3)
+
+    def test_votes_ndjson(self):
+        """Raw votes are streamed as one JSON object per line."""
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url,
+                                   {"kind": "votes", "format": "ndjson"})
+        rows = [json.loads(line)
+                for line in self.content(response).splitlines()]
+        self.assertEqual([row["username"] for row in rows],
+                         ["voter0", "voter1", "voter2"])
+        self.assertEqual(rows[2]["choice_id"], self.choice2.id)
+
+    def test_unknown_format(self):
+        """An unknown format is a bad request."""
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        """The command writes the same export to stdout."""
+        out = StringIO()
+        call_command("export_poll", self.question.id, kind="votes",
+                     stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+
+    @override_settings(ROOT_URLCONF="mysite.async_urls")
+    async def test_async_stream(self):
+        """Under ASGI the export is streamed from an async iterator."""
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(
+            self.url, {"kind": "votes", "format": "ndjson"})
+        self.assertTrue(response.is_async)
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])["username"], "voter0")
+        response = await self.async_client.get(self.url)
+        lines = b"".join([line async for line in response.streaming_content])
+        self.assertEqual(lines.decode().splitlines()[1],
+                         f"{self.question.id},Export me,{self.choice1.id},"
+                         f"One,2")
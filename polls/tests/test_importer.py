@@ -0,0 +1,118 @@
+"""Test importing votes in bulk."""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from polls.models import Choice, Question, Vote
+
+
+class ImportVotesTests(TestCase):
+    """Test the bulk vote import command and endpoint."""
+
+    def setUp(self):
+        """Create two questions and some voters."""
+        self.question = Question.objects.create(question_text="Ballot")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        self.other = Question.objects.create(question_text="Other")
+        self.other_choice = Choice.objects.create(question=self.other,
+                                                  choice_text="Three")
+        for name in ["demo1", "demo2", "demo3"]:
+            User.objects.create_user(username=name)
+
+    def write_csv(self, rows):
+        """Write ballots to a temporary CSV file and return its path."""
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w") as output:
+            output.write("username,question_id,choice_id\n")
+            for row in rows:
+                output.write(",".join(str(value) for value in row) + "\n")
+        self.addCleanup(os.remove, path)
+        return path
+
+    def votes(self, choice):
+        """Return the vote counter of a choice."""
+        choice.refresh_from_db()
+        return choice.votes
+
+    def test_import_command(self):
+        """Valid ballots are applied in batches and bad rows rejected."""
+        q, c1, c2 = self.question.id, self.choice1.id, self.choice2.id
+        path = self.write_csv([
+            ("demo1", q, c1),
+            ("demo2", q, c1),
+            ("demo1", q, c2),              # changes demo1's ballot
+            ("nobody", q, c1),             # unknown user
+            ("demo3", q, self.other_choice.id),  # choice of another poll
+            ("demo3", "x", c1),            # malformed
+        ])
+        out, err = StringIO(), StringIO()
+        call_command("import_votes", path, batch_size=2, stdout=out,
+                     stderr=err)
+        self.assertEqual(Vote.objects.count(), 2)
+        self.assertEqual(Vote.objects.get(user__username="demo1").choice,
+                         self.choice2)
+        self.assertEqual((self.votes(self.choice1), self.votes(self.choice2)),
+                         (1, 1))
+        self.assertIn("Imported 3 votes, rejected 3 records.", out.getvalue())
+        self.assertEqual(out.getvalue().count("batch:"), 3)
+        self.assertIn("line 5: no user 'nobody'", err.getvalue())
+
+    def test_import_needs_a_batch(self):
+        """A batch size below 1 is refused before reading the file."""
+        path = self.write_csv([("demo1", self.question.id, self.choice1.id)])
+        with self.assertRaisesMessage(CommandError, "at least 1"):
+            call_command("import_votes", path, "--batch-size", "0",
+                         stdout=StringIO())
+        self.assertFalse(Vote.objects.exists())
+
+    def test_import_replaces_existing_vote(self):
+        """An imported ballot replaces the user's earlier vote."""
+        Vote.objects.create(user=User.objects.get(username="demo1"),
+                            choice=self.choice1)
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=1)
+        path = self.write_csv([("demo1", self.question.id, self.choice2.id)])
+        call_command("import_votes", path, stdout=StringIO())
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertEqual((self.votes(self.choice1), self.votes(self.choice2)),
+                         (0, 1))
+
+    def test_import_endpoint(self):
+        """Staff members can post NDJSON ballots."""
+        url = reverse("polls:import") + "?format=ndjson"
+        body = "\n".join([
+            json.dumps({"username": "demo1",
+                        "question_id": self.other.id,
+                        "choice_id": self.other_choice.id}),
+            "not json",
+        ])
+        self.client.force_login(User.objects.get(username="demo1"))
+        response = self.client.post(url, body,
+                                    content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 302)
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.post(url, body,
+                                    content_type="application/x-ndjson")
+        self.assertEqual(response.json(), {
+            "imported": 1,
+            "rejected": [{"line": 2, "reason": "malformed record"}],
+        })
+        self.assertEqual(self.votes(self.other_choice), 1)
+
+    def test_import_endpoint_needs_utf8(self):
+        """A body that isn't UTF-8 is a bad request, not a server error."""
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        self.client.force_login(staff)
+        body = "username,question_id,choice_id\n".encode() + b"\xff\xfe,1,1\n"
+        response = self.client.post(reverse("polls:import"), body,
+                                    content_type="text/csv")
+        self.assertContains(response, "Line 2 isn't UTF-8", status_code=400)
@@ -0,0 +1,102 @@
+"""Tests of the per-view request instrumentation."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from polls.instrumentation import Histogram, registry
+from polls.models import Question
+
+
+class HistogramTests(TestCase):
+    """Test the bucketed histogram."""
+
+    def test_cumulative_buckets(self):
+        """Each bucket counts every observation up to its bound."""
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 9):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(),
+                         [(1, 2), (5, 3), ("+Inf", 4)])
+        self.assertEqual(histogram.sum, 13)
+
+
+class RequestStatsMiddlewareTests(TestCase):
+    """Test what the middleware records for each view."""
+
+    def setUp(self):
+        """Start from an empty registry and log in a staff member."""
+        registry.clear()
+        self.question = Question.objects.create(
+            question_text="Instrumented?", pub_date=timezone.now())
+        User.objects.create_user(username="staff", password="FatChance!",
+                                 is_staff=True)
+
+    def test_records_queries_and_size(self):
+        """A view's queries and response size are recorded."""
+        self.client.login(username="staff", password="FatChance!")
+        registry.clear()
+        response = self.client.get(reverse("polls:index"))
+        views = registry.snapshot()
+        index = views["polls:index"]
+        self.assertEqual(index["queries"]["count"], 1)
+        self.assertGreaterEqual(index["queries"]["sum"], 1)
+        self.assertEqual(index["response_bytes"]["sum"],
+                         len(response.content))
+        self.assertGreater(index["render_seconds"]["sum"], 0)
+
+    def test_render_time_of_cached_pages(self):
+        """A cached page's render is timed once, and a hit has none."""
+        cache.clear()
+        for _ in range(2):
+            self.client.get(reverse("polls:index"))
+        render = registry.snapshot()["polls:index"]["render_seconds"]
+        self.assertEqual(render["count"], 1)
+        self.assertGreater(render["sum"], 0)
+
+    @override_settings(ROOT_URLCONF="mysite.async_urls")
+    async def test_render_time_of_async_views(self):
+        """The async views' rendering is timed too."""
+        await self.async_client.aforce_login(
+            await User.objects.aget(username="staff"))
+        await self.async_client.get(reverse("polls:index"))
+        render = registry.snapshot()["polls:index"]["render_seconds"]
+        self.assertGreater(render["sum"], 0)
+
+    def test_stats_and_metrics_endpoints(self):
+        """Staff members see the histograms as JSON and as text."""
+        self.client.login(username="staff", password="FatChance!")
+        self.client.get(reverse("polls:index"))
+        stats = self.client.get(reverse("polls:stats")).json()
+        self.assertIn("polls:index", stats["views"])
+        response = self.client.get(reverse("polls:metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'polls_request_queries_count{view="polls:index"} 1',
+                      response.content)
+
+    @override_settings(QUERY_LOG_THRESHOLD=0)
+    def test_threshold_disabled(self):
+        """No SQL is logged when the threshold is zero."""
+        with self.assertNoLogs("polls", level="WARNING"):
+            self.client.get(reverse("polls:index"))
+
+    @override_settings(QUERY_LOG_THRESHOLD=1)
+    def test_threshold_logs_sql(self):
+        """A request over the threshold has its SQL logged."""
+        self.client.login(username="staff", password="FatChance!")
+        with self.assertLogs("polls", level="WARNING") as logs:
+            self.client.get(reverse("polls:detail", args=(self.question.id,)))
+        self.assertIn("SELECT", logs.output[0])
+
+
+@override_settings(ROOT_URLCONF="mysite.async_urls")
+class AsyncRequestStatsTests(TestCase):
+    """Test the middleware in front of the async views."""
+
+    async def test_counts_queries_of_async_views(self):
+        """Queries run by async views are counted."""
+        registry.clear()
+        await self.async_client.get(reverse("polls:index"))
+        index = registry.snapshot()["polls:index"]
+        self.assertGreaterEqual(index["queries"]["sum"], 1)
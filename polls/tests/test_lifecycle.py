@@ -0,0 +1,78 @@
+"""Test the lifecycle scheduler of questions."""
+import datetime
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from polls import lifecycle, page_cache
+from polls.models import Question
+
+HOUR = datetime.timedelta(hours=1)
+
+
+class LifecycleTests(TestCase):
+    """Test that statuses follow the questions' dates."""
+
+    def setUp(self):
+        """Create a question that opens in one hour and closes in two."""
+        cache.clear()
+        self.now = timezone.now()
+        self.question = Question.objects.create(
+            question_text="Soon", pub_date=self.now + HOUR,
+            end_date=self.now + 2 * HOUR)
+
+    def status(self):
+        """Return the stored status of the question."""
+        return Question.objects.get(pk=self.question.pk).status
+
+    def test_save_materializes_status(self):
+        """Saving a question sets its status from its dates."""
+        self.assertEqual(self.question.status, Question.Status.SCHEDULED)
+        self.question.pub_date = self.now - HOUR
+        self.question.save(update_fields=["pub_date"])
+        self.assertEqual(self.status(), Question.Status.OPEN)
+
+    def test_advance_through_boundaries(self):
+        """Advancing past each boundary opens, then closes, the question."""
+        self.assertEqual(lifecycle.next_transition(), self.now + HOUR)
+        self.assertEqual(lifecycle.advance(self.now + HOUR), 1)
+        self.assertEqual(self.status(), Question.Status.OPEN)
+        self.assertEqual(lifecycle.next_transition(), self.now + 2 * HOUR)
+        self.assertEqual(lifecycle.advance(self.now + 2 * HOUR), 0)
+        lifecycle.advance(self.now + 3 * HOUR)
+        self.assertEqual(self.status(), Question.Status.CLOSED)
+        self.assertIsNone(lifecycle.next_transition())
+
+    def test_tick_only_queries_at_boundaries(self):
+        """A tick before the next boundary costs no queries."""
+        lifecycle.tick(self.now)
+        version = page_cache.content_version()
+        with self.assertNumQueries(0):
+            lifecycle.tick(self.now + lifecycle.RECHECK / 2)
+        lifecycle.tick(self.now + HOUR)
+        self.assertEqual(self.status(), Question.Status.OPEN)
+        self.assertNotEqual(page_cache.content_version(), version)
+
+    def test_bulk_created_question_closes(self):
+        """Dates written without save() are picked up by the next ticks."""
+        Question.objects.all().delete()
+        lifecycle.tick(self.now)
+        question = Question(question_text="Bulk", pub_date=self.now - HOUR,
+                            end_date=self.now + HOUR)
+        question.status = question.current_status()
+        Question.objects.bulk_create([question])
+        lifecycle.tick(self.now + 2 * HOUR)
+        self.assertEqual(Question.objects.get().status,
+                         Question.Status.CLOSED)
+
+    def test_command(self):
+        """The command advances the questions and reports the next change."""
+        Question.objects.filter(pk=self.question.pk) \
+            .update(pub_date=self.now - HOUR)
+        out = StringIO()
+        call_command("poll_scheduler", stdout=out)
+        self.assertEqual(self.status(), Question.Status.OPEN)
+        self.assertIn("1 questions changed status", out.getvalue())
@@ -0,0 +1,80 @@
+"""Test the live results stream."""
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import NoReverseMatch, reverse
+
+from polls.live import stream
+from polls.models import Choice, Question
+from polls.results import bump_version
+
+
+def payload(message):
+    """Return the results carried by a server-sent event."""
+    return json.loads(message.split("data: ", 1)[1])
+
+
+class LiveResultsTests(TestCase):
+    """Test the server-sent events of a question's results."""
+
+    def setUp(self):
+        """Create a question with a choice."""
+        cache.clear()
+        self.question = Question.objects.create(question_text="Live")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="One")
+
+    async def test_changes_are_coalesced(self):
+        """A burst of changes produces one update with the final tally."""
+        events = stream(self.question.id, interval=0.05, heartbeat=0.1)
+        self.assertEqual(payload(await anext(events))["total"], 0)
+        for votes in range(1, 6):
+            await Choice.objects.filter(pk=self.choice.pk) \
+                .aupdate(votes=votes)
+            await sync_to_async(bump_version)(self.question.id)
+        self.assertEqual(payload(await anext(events))["total"], 5)
+        # The whole burst was delivered by that one update.
+        self.assertEqual(await anext(events), ": keep-alive\n\n")
+
+    async def test_heartbeat(self):
+        """An idle stream sends keep-alive comments."""
+        events = stream(self.question.id, interval=0.01, heartbeat=0.01)
+        await anext(events)
+        self.assertEqual(await anext(events), ": keep-alive\n\n")
+
+    async def test_releases_connection(self):
+        """The stream gives back its database connection between events."""
+        events = stream(self.question.id, interval=0.01, heartbeat=0.01)
+        with mock.patch("polls.live.release_connections") as release:
+            await anext(events)
+            await anext(events)
+        release.assert_awaited_once()
+
+    @override_settings(ROOT_URLCONF="mysite.async_urls")
+    async def test_endpoint(self):
+        """The endpoint streams events starting with the current results."""
+        url = reverse("polls:live_results", args=(self.question.id,))
+        response = await self.async_client.get(url)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        content = aiter(response.streaming_content)
+        first = (await anext(content)).decode()
+        self.assertTrue(first.startswith("event: results\n"))
+        self.assertEqual(payload(first)["choices"][0]["text"], "One")
+        await content.aclose()
+
+    @override_settings(ROOT_URLCONF="mysite.async_urls")
+    async def test_async_page_subscribes(self):
+        """The async results page of a running poll subscribes."""
+        url = reverse("polls:results", args=(self.question.id,))
+        response = await self.async_client.get(url)
+        self.assertContains(response, "EventSource")
+
+    def test_sync_page_does_not_subscribe(self):
+        """Under WSGI there is no stream, and the page doesn't ask for one."""
+        with self.assertRaises(NoReverseMatch):
+            reverse("polls:live_results", args=(self.question.id,))
+        url = reverse("polls:results", args=(self.question.id,))
+        self.assertNotContains(self.client.get(url), "EventSource")
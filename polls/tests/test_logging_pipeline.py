@@ -0,0 +1,89 @@
+"""Tests of the queued, structured logging pipeline."""
+
+import json
+import logging
+import time
+from django.conf import settings
+from django.test import SimpleTestCase
+from polls.logging_pipeline import JsonFormatter, QueuedHandler
+
+
+class SlowHandler(logging.Handler):
+    """A handler standing in for a slow disk."""
+
+    def __init__(self):
+        """Start with no records written."""
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        """Take a while to write each record."""
+        time.sleep(0.05)
+        self.records.append(record)
+
+
+class JsonFormatterTests(SimpleTestCase):
+    """Test the JSON log format."""
+
+    def test_extra_fields(self):
+        """Fields passed through extra are written out."""
+        record = logging.makeLogRecord({
+            "msg": "voted %s", "args": (3,), "levelno": logging.INFO,
+            "levelname": "INFO", "event": "vote", "question": 3,
+        })
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual(data["message"], "voted 3")
+        self.assertEqual((data["event"], data["question"]), ("vote", 3))
+        self.assertNotIn("args", data)
+
+
+class QueuedHandlerTests(SimpleTestCase):
+    """Test the queue in front of the real handlers."""
+
+    def setUp(self):
+        """Route a private logger through a queue to a slow handler."""
+        self.slow = SlowHandler()
+        self.slow.name = "test-slow"
+        logging._handlers[self.slow.name] = self.slow
+        self.handler = QueuedHandler([self.slow.name], maxsize=4,
+                                     sample_every=2)
+        self.logger = logging.getLogger("polls.tests.pipeline")
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        """Detach the handlers again."""
+        self.logger.removeHandler(self.handler)
+        self.handler.stop()
+        del logging._handlers[self.slow.name]
+
+    def test_records_are_written_in_background(self):
+        """A slow handler does not hold up the caller."""
+        started = time.perf_counter()
+        self.logger.info("voted")
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.handler.stop()
+        self.assertEqual(self.slow.records[0].getMessage(), "voted")
+
+    def test_backpressure_samples_then_drops(self):
+        """A filling queue samples info records, a full one drops them."""
+        for number in range(20):
+            self.logger.info("vote %d", number)
+        self.logger.warning("still kept")
+        stats = self.handler.stats()
+        self.assertGreater(stats["sampled_out"], 0)
+        self.assertGreater(stats["dropped"], 0)
+        self.assertEqual(stats["queued"] + stats["sampled_out"]
+                         + stats["dropped"], 21)
+        self.assertLess(stats["max_emit_seconds"], 0.05)
+
+
+class FileHandlerTests(SimpleTestCase):
+    """Test the handler writing the log file."""
+
+    def test_file_is_reopened_after_rotation(self):
+        """Every worker reopens the log file once logrotate moves it."""
+        handler = settings.LOGGING["handlers"]["json"]
+        self.assertEqual(handler["class"],
+                         "logging.handlers.WatchedFileHandler")
+        self.assertNotIn("maxBytes", handler)
@@ -0,0 +1,101 @@
+"""Test the page cache of anonymous index and results pages."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question
+
+
+class PageCacheTests(TestCase):
+    """Test caching and revalidation of whole pages."""
+
+    def setUp(self):
+        """Create a question with a choice, and start with no cache."""
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text="Cached?", pub_date=timezone.now())
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+        self.index_url = reverse("polls:index")
+        self.results_url = reverse("polls:results", args=(self.question.id,))
+
+    def test_anonymous_hit(self):
+        """A repeated anonymous request is served from the cache."""
+        first = self.client.get(self.index_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.index_url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.client.get(self.results_url)
+        with self.assertNumQueries(0):
+            self.client.get(self.results_url)
+
+    def test_conditional_get(self):
+        """A request with the page's ETag gets a 304."""
+        etag = self.client.get(self.results_url)["ETag"]
+        response = self.client.get(self.results_url,
+                                   headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_changes_invalidate(self):
+        """Votes and edits change the pages' keys."""
+        etag = self.client.get(self.results_url)["ETag"]
+        voter = User.objects.create_user(username="voter")
+        self.client.force_login(voter)
+        self.client.post(reverse("polls:vote", args=(self.question.id,)),
+                         {"choice": self.choice.id})
+        self.client.logout()
+        response = self.client.get(self.results_url,
+                                   headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["results"]["total"], 1)
+        before = self.client.get(self.index_url)
+        self.question.question_text = "Renamed"
+        self.question.save()
+        after = self.client.get(self.index_url)
+        self.assertNotEqual(before["ETag"], after["ETag"])
+        self.assertContains(after, "Renamed")
+
+    def test_signed_in_users_get_their_own_page(self):
+        """Signed-in users see their personalized header, not the cache."""
+        self.client.get(self.index_url)
+        voter = User.objects.create_user(username="voter")
+        self.client.force_login(voter)
+        response = self.client.get(self.index_url)
+        self.assertContains(response, "Welcome&nbsp;Back,&nbsp;voter")
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_fragments_expire_with_page_cache(self):
+        """The fragment cache follows PAGE_CACHE_TIMEOUT."""
+        self.client.force_login(User.objects.create_user(username="voter"))
+        # Renamed without save(), so the pages' keys stay the same.
+        questions = Question.objects.filter(pk=self.question.pk)
+        with override_settings(PAGE_CACHE_TIMEOUT=0):
+            self.client.get(self.index_url)
+            questions.update(question_text="Expired")
+            self.assertContains(self.client.get(self.index_url), "Expired")
+        self.client.get(self.index_url)
+        questions.update(question_text="Renamed")
+        self.assertNotContains(self.client.get(self.index_url), "Renamed")
+
+
+@override_settings(ROOT_URLCONF="mysite.async_urls")
+class AsyncPageCacheTests(TestCase):
+    """Test the page cache in front of the async views."""
+
+    def setUp(self):
+        """Create a question, and start with no cache."""
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text="Cached?", pub_date=timezone.now())
+
+    async def test_conditional_get(self):
+        """The async views serve cached pages and 304s too."""
+        url = reverse("polls:index")
+        first = await self.async_client.get(url)
+        response = await self.async_client.get(
+            url, headers={"if-none-match": first["ETag"]})
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,247 @@
+"""Test the throttling of sign-ins and votes."""
+
+import time
+from io import StringIO
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from polls.models import Choice, Question
+from polls.ratelimit import SlidingWindow, get_client_ip, login_stats, \
+    parse_rate, rate_limit_stats
+
+PBKDF2 = ["django.contrib.auth.hashers.PBKDF2PasswordHasher"]
+
+
+class SlidingWindowTests(TestCase):
+    """Test counting events over a sliding window."""
+
+    def setUp(self):
+        """Start with no events."""
+        cache.clear()
+        self.window = SlidingWindow("test", limit=3, window=60)
+
+    def test_limit(self):
+        """A key is limited once it has `limit` events."""
+        for _ in range(2):
+            self.window.hit("key", now=600)
+        self.assertFalse(self.window.exceeded("key", now=600))
+        self.window.hit("key", now=600)
+        self.assertTrue(self.window.exceeded("key", now=600))
+        self.assertFalse(self.window.exceeded("other", now=600))
+
+    def test_old_events_fade_out(self):
+        """The previous window counts in proportion to its overlap."""
+        for _ in range(4):
+            self.window.hit("key", now=630)
+        self.assertEqual(self.window.count("key", now=675), 3)
+        self.assertEqual(self.window.count("key", now=690), 2)
+        self.assertEqual(self.window.count("key", now=720), 0)
+
+    def test_many_clients_kept(self):
+        """Counters aren't culled once a few hundred clients are counted."""
+        for client in range(1000):
+            self.window.hit(client, now=600)
+        self.assertEqual(self.window.count(0, now=600), 1)
+
+    def test_reset(self):
+        """A reset key starts again from no events."""
+        for _ in range(3):
+            self.window.hit("key", now=600)
+        self.window.reset("key", now=600)
+        self.assertEqual(self.window.count("key", now=600), 0)
+
+
+class ClientIpTests(TestCase):
+    """Test telling clients apart by their IP address."""
+
+    def setUp(self):
+        """Build requests relayed by a proxy at 10.0.0.1."""
+        self.factory = RequestFactory()
+
+    def ip(self, forwarded_for):
+        """Return the client IP of a request with an X-Forwarded-For."""
+        return get_client_ip(self.factory.get(
+            "/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR=forwarded_for))
+
+    def test_header_ignored_without_proxies(self):
+        """Without trusted proxies, the connecting address is used."""
+        self.assertEqual(self.ip("203.0.113.7"), "10.0.0.1")
+
+    @override_settings(TRUSTED_PROXIES=1)
+    def test_address_added_by_proxy(self):
+        """Addresses the client made up in front of the proxy's are ignored."""
+        self.assertEqual(self.ip("203.0.113.7"), "203.0.113.7")
+        self.assertEqual(self.ip("1.2.3.4, 203.0.113.7"), "203.0.113.7")
+
+    @override_settings(TRUSTED_PROXIES=2)
+    def test_too_few_hops(self):
+        """A request that bypassed a proxy is known by its own address."""
+        self.assertEqual(self.ip("203.0.113.7"), "10.0.0.1")
+
+
+@override_settings(LOGIN_FAILURES_PER_IP=3, LOGIN_FAILURES_PER_USERNAME=2)
+class LoginThrottleTests(TestCase):
+    """Test refusing sign-ins after too many failures."""
+
+    def setUp(self):
+        """Create a user and forget earlier failures."""
+        cache.clear()
+        self.user = User.objects.create_user(username="voter",
+                                             password="FatChance!")
+        self.factory = RequestFactory()
+
+    def attempt(self, username, password="wrong", ip="10.0.0.1"):
+        """Try to sign in from an IP address, returning the user."""
+        request = self.factory.post(reverse("login"), REMOTE_ADDR=ip)
+        return authenticate(request, username=username, password=password)
+
+    def test_username_throttled(self):
+        """Even the right password is refused after too many failures."""
+        self.attempt("voter", ip="10.0.0.1")
+        self.attempt("voter", ip="10.0.0.2")
+        self.assertIsNone(self.attempt("voter", "FatChance!", ip="10.0.0.3"))
+        self.assertEqual(self.attempt("other", "FatChance!"), None)
+
+    def test_ip_throttled(self):
+        """An IP trying many usernames is refused."""
+        for username in ("a", "b", "c"):
+            self.attempt(username)
+        self.assertIsNone(self.attempt("voter", "FatChance!"))
+        self.assertEqual(self.attempt("voter", "FatChance!", ip="10.0.0.9"),
+                         self.user)
+
+    def test_sign_in_clears_failures(self):
+        """A successful sign-in forgets the username's failures."""
+        self.attempt("voter")
+        self.client.login(username="voter", password="FatChance!")
+        self.attempt("voter")
+        self.assertEqual(self.attempt("voter", "FatChance!"), self.user)
+
+    def test_counters(self):
+        """Refused attempts are counted and don't count as failures."""
+        before = login_stats()
+        for _ in range(4):
+            self.attempt("voter")
+        after = login_stats()
+        self.assertEqual(after["failures"] - before["failures"], 2)
+        self.assertEqual(
+            after["refused_username"] - before["refused_username"], 2)
+
+    def test_login_page_refuses(self):
+        """The login form shows its usual error to a throttled visitor."""
+        for _ in range(2):
+            self.attempt("voter", ip="127.0.0.1")
+        response = self.client.post(reverse("login"), {
+            "username": "voter", "password": "FatChance!"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context["user"].is_authenticated)
+
+    @override_settings(PASSWORD_HASHERS=PBKDF2)
+    def test_refused_attempt_skips_hashing(self):
+        """A refused attempt costs next to no CPU time."""
+        User.objects.create_user(username="unusable")
+        started = time.process_time()
+        self.attempt("unusable")
+        hashed = time.process_time() - started
+        self.attempt("unusable")
+        started = time.process_time()
+        for _ in range(10):
+            self.attempt("unusable")
+        refused = (time.process_time() - started) / 10
+        self.assertLess(refused, hashed / 20)
+
+
+class RateTests(TestCase):
+    """Test taking places in rate-limit windows."""
+
+    def setUp(self):
+        """Start with no requests counted."""
+        cache.clear()
+        self.window = SlidingWindow("test:rate", limit=2, window=60)
+
+    def test_parse_rate(self):
+        """Rates give a count and a window in seconds."""
+        self.assertEqual(parse_rate("30/m"), (30, 60))
+        self.assertEqual(parse_rate("5/10s"), (5, 10))
+        with self.assertRaises(ValueError):
+            parse_rate("30 per minute")
+
+    def test_take_until_full(self):
+        """A full window refuses until the end of its period."""
+        self.assertEqual(self.window.take("key", now=600), 0)
+        self.assertEqual(self.window.take("key", now=615), 0)
+        self.assertEqual(self.window.take("key", now=630), 30)
+        self.assertEqual(self.window.take("other", now=630), 0)
+
+    def test_refused_requests_are_not_counted(self):
+        """A client retrying too early doesn't push its wait back."""
+        for _ in range(2):
+            self.window.take("key", now=600)
+        for _ in range(5):
+            self.window.take("key", now=610)
+        self.assertEqual(self.window.count("key", now=610), 2)
+        # Half the previous window still overlaps, one request fits.
+        self.assertEqual(self.window.take("key", now=690), 0)
+        self.assertEqual(self.window.take("key", now=690), 30)
+
+
+class VoteRateLimitTests(TestCase):
+    """Test limiting the voting views."""
+
+    def setUp(self):
+        """Sign in a voter, create a question and forget earlier votes."""
+        cache.clear()
+        self.user = User.objects.create_user(username="voter")
+        self.question = Question.objects.create(question_text="Limited?")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+        self.vote_url = reverse("polls:vote", args=(self.question.id,))
+        self.client.force_login(self.user)
+
+    @override_settings(RATE_LIMITS={"polls:vote": {"user": "2/h"}})
+    def test_user_limited(self):
+        """A voter out of tokens gets a 429 with Retry-After."""
+        for _ in range(2):
+            response = self.client.post(self.vote_url,
+                                        {"choice": self.choice.id})
+            self.assertEqual(response.status_code, 302)
+        response = self.client.post(self.vote_url, {"choice": self.choice.id})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response["Retry-After"]), range(1, 3601))
+        unvote_url = reverse("polls:unvote", args=(self.question.id,))
+        self.assertEqual(self.client.post(unvote_url).status_code, 302)
+        self.assertIn("polls:vote", rate_limit_stats())
+
+    @override_settings(RATE_LIMITS={"polls:vote": {"ip": "1/h"}})
+    def test_ip_limited(self):
+        """Requests from an IP out of tokens are refused for everyone."""
+        self.client.post(self.vote_url, {"choice": self.choice.id})
+        self.client.logout()
+        response = self.client.post(self.vote_url, {"choice": self.choice.id})
+        self.assertEqual(response.status_code, 429)
+        response = self.client.post(self.vote_url, {"choice": self.choice.id},
+                                    REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(ROOT_URLCONF="mysite.async_urls",
+                       RATE_LIMITS={"polls:vote": {"user": "1/h"}})
+    async def test_async_vote_limited(self):
+        """The async voting views are limited too."""
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.post(self.vote_url,
+                                     {"choice": self.choice.id})
+        response = await self.async_client.post(self.vote_url,
+                                                {"choice": self.choice.id})
+        self.assertEqual(response.status_code, 429)
+
+    def test_benchmark(self):
+        """The microbenchmark reports the limiter's costs."""
+        out = StringIO()
+        call_command("bench_rate_limits", calls=10, stdout=out)
+        self.assertIn("view overhead", out.getvalue())
+        self.assertIn("429 response", out.getvalue())
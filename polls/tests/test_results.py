@@ -0,0 +1,66 @@
+"""Test the cache of poll results."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from polls import results
+from polls.models import Choice, Question
+
+
+class ResultsCacheTests(TestCase):
+    """Test the versioned results snapshots."""
+
+    def setUp(self):
+        """Create a question with two choices and a voter."""
+        cache.clear()
+        results._stats.clear()
+        self.question = Question.objects.create(question_text="Cached")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        self.user = User.objects.create_user(username="voter",
+                                             password="FatChance!")
+
+    def test_second_read_is_a_hit(self):
+        """A repeated read is served from the cache without queries."""
+        results.cached_tally(self.question.id)
+        with self.assertNumQueries(0):
+            results.cached_tally(self.question.id)
+        stats = results.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_vote_invalidates_results(self):
+        """Voting bumps the version, so the next read sees the vote."""
+        self.assertEqual(results.cached_tally(self.question.id)["total"], 0)
+        self.client.login(username="voter", password="FatChance!")
+        self.client.post(reverse("polls:vote", args=(self.question.id,)),
+                         {"choice": self.choice2.id})
+        tally = results.cached_tally(self.question.id)
+        self.assertEqual(tally["total"], 1)
+        self.client.post(reverse("polls:unvote", args=(self.question.id,)))
+        self.assertEqual(results.cached_tally(self.question.id)["total"], 0)
+
+    def test_evicted_version_does_not_revive_old_snapshot(self):
+        """Losing the version key never serves an older snapshot."""
+        results.cached_tally(self.question.id)
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=5)
+        cache.delete(results._version_key(self.question.id))
+        self.assertEqual(results.cached_tally(self.question.id)["total"], 5)
+
+
+class StatsViewTests(TestCase):
+    """Test the statistics endpoint."""
+
+    def test_staff_only(self):
+        """Only staff members can see the statistics."""
+        url = reverse("polls:stats")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        User.objects.create_user(username="staff", password="FatChance!",
+                                 is_staff=True)
+        self.client.login(username="staff", password="FatChance!")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hits", response.json()["results_cache"])
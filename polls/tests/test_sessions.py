@@ -0,0 +1,81 @@
+"""Test the fast session and signed-in user modes."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.backends import CachedModelBackend
+from polls.models import Choice, Question
+
+CACHED_USERS = ["polls.backends.CachedModelBackend"]
+
+
+class CachedModelBackendTests(TestCase):
+    """Test loading signed-in users from the cache."""
+
+    def setUp(self):
+        """Create a user and an empty cache."""
+        cache.clear()
+        self.user = User.objects.create_user(username="voter")
+        self.backend = CachedModelBackend()
+
+    def test_user_is_cached(self):
+        """Only the first lookup of a user queries the database."""
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_saved_user_is_reloaded(self):
+        """A deactivated user is no longer served from the cache."""
+        self.backend.get_user(self.user.pk)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    @override_settings(AUTHENTICATION_BACKENDS=CACHED_USERS)
+    def test_deactivated_user_is_logged_out(self):
+        """Deactivating a signed-in user signs them out at once."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("polls:index"))
+        self.assertTrue(response.context["user"].is_authenticated)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse("polls:index"))
+        self.assertFalse(response.context["user"].is_authenticated)
+
+
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies",
+    AUTHENTICATION_BACKENDS=CACHED_USERS,
+)
+class SignedCookieSessionTests(TestCase):
+    """Test voting with the session and user kept out of the database."""
+
+    def setUp(self):
+        """Sign in a voter and create a question."""
+        cache.clear()
+        self.user = User.objects.create_user(username="voter",
+                                             password="FatChance!")
+        self.question = Question.objects.create(question_text="Signed?")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+
+    def test_login_and_vote(self):
+        """A voter signs in, votes and sees the vote's message."""
+        self.assertTrue(self.client.login(username="voter",
+                                          password="FatChance!"))
+        response = self.client.post(
+            reverse("polls:vote", args=(self.question.id,)),
+            {"choice": self.choice.id}, follow=True)
+        self.assertContains(response, "You have voted &quot;Yes&quot;")
+        self.assertEqual(self.choice.vote_set.get().user, self.user)
+
+    def test_session_needs_no_queries(self):
+        """Neither the session nor the cached user cost a query."""
+        self.client.force_login(self.user)
+        self.client.get(reverse("polls:index"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("login"))
+        self.assertEqual(response.wsgi_request.user, self.user)
@@ -1,11 +1,18 @@
 """Test that views display elements properly."""
 import datetime
 
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
 from django.urls import reverse
+from django.utils.http import urlencode
 
-from polls.models import Question
+from polls import lifecycle
+from polls.models import Choice, Question, Vote
+from polls.views import IndexView
+
+DAY = datetime.timedelta(days=1)
 
 
 def create_question(question_text, days):
@@ -44,6 +51,10 @@ def create_question_2(t1, t2):
 class QuestionIndexViewTests(TestCase):
     """Test the index view."""
 
+    def setUp(self):
+        """Start every test with no cached pages."""
+        cache.clear()
+
     def test_no_questions(self):
         """If no questions exist, an appropriate message is displayed."""
         response = self.client.get(reverse("polls:index"))
@@ -91,10 +102,70 @@ class QuestionIndexViewTests(TestCase):
             [question2, question1],
         )
 
+    def test_open_and_closed_status(self):
+        """The index marks each question as open or closed."""
+        create_question_2(-30, -1)
+        create_question_2(-30, 30)
+        response = self.client.get(reverse("polls:index"))
+        page = response.context["latest_question_list"]
+        statuses = [question.is_open for question in page]
+        self.assertEqual(sorted(statuses), [False, True])
+        self.assertContains(response, "Status : Open")
+        self.assertContains(response, "Status : Closed")
+
+    def test_keyset_pagination(self):
+        """Following the cursors visits every question exactly once."""
+        pub_date = timezone.now() - datetime.timedelta(days=1)
+        for n in range(25):
+            # Some questions share their pub_date, so the id breaks ties.
+            Question.objects.create(question_text=f"Question {n}",
+                                    pub_date=pub_date - n // 2 * DAY)
+        lifecycle.tick()
+        url = reverse("polls:index")
+        seen = []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            page = response.context["latest_question_list"]
+            self.assertLessEqual(len(page), IndexView.page_size)
+            seen.extend(question.id for question in page)
+            cursor = response.context["next_cursor"]
+            url = cursor and reverse("polls:index") + "?" + urlencode(
+                {"before": cursor})
+        self.assertEqual(
+            seen,
+            list(Question.objects.order_by("-pub_date", "-pk")
+                 .values_list("pk", flat=True)),
+        )
+
+    def test_voted_badge(self):
+        """The index marks the questions the user voted on."""
+        voted = create_question(question_text="Voted", days=-2)
+        create_question(question_text="Not voted", days=-1)
+        user = User.objects.create_user(username="voter")
+        Vote.objects.create(user=user, choice=Choice.objects.create(
+            question=voted, choice_text="Yes"))
+        cache.clear()
+        self.client.force_login(user)
+        response = self.client.get(reverse("polls:index"))
+        page = response.context["latest_question_list"]
+        self.assertEqual([question.voted for question in page],
+                         [False, True])
+        self.assertContains(response, "You voted", count=1)
+
+    def test_invalid_cursor(self):
+        """A malformed cursor is a 404."""
+        response = self.client.get(reverse("polls:index") + "?before=junk")
+        self.assertEqual(response.status_code, 404)
+
 
 class QuestionDetailViewTests(TestCase):
     """Test the detail view."""
 
+    def setUp(self):
+        """Start every test with no cached vote maps."""
+        cache.clear()
+
     def test_future_question(self):
         """
         The detail view of a question with a pub_date in the future.
@@ -118,3 +189,82 @@ class QuestionDetailViewTests(TestCase):
         url = reverse("polls:detail", args=(past_question.id,))
         response = self.client.get(url)
         self.assertContains(response, past_question.question_text)
+
+    def test_number_of_queries(self):
+        """The page loads the question, choices and vote in fixed queries."""
+        question = create_question(question_text="Detail", days=-5)
+        for n in range(10):
+            Choice.objects.create(question=question, choice_text=f"C{n}")
+        user = User.objects.create_user(username="voter")
+        Vote.objects.create(user=user, choice=question.choice_set.last())
+        lifecycle.tick()
+        url = reverse("polls:detail", args=(question.id,))
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        self.client.force_login(user)
+        # Session, user, the user's vote map, question, and the choices.
+        with self.assertNumQueries(5):
+            self.client.get(url)
+        # The vote map is cached from then on.
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.context["marked_choice"],
+                         question.choice_set.last())
+
+    def test_vote_invalidates_cached_vote_map(self):
+        """Voting and unvoting make the vote map load again."""
+        question = create_question(question_text="Detail", days=-5)
+        choice = Choice.objects.create(question=question, choice_text="C")
+        user = User.objects.create_user(username="voter")
+        self.client.force_login(user)
+        url = reverse("polls:detail", args=(question.id,))
+        self.client.get(url)
+        self.client.post(reverse("polls:vote", args=(question.id,)),
+                         {"choice": choice.id})
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual(response.context["marked_choice"], choice)
+        self.client.post(reverse("polls:unvote", args=(question.id,)))
+        self.assertNotIn("marked_choice", self.client.get(url).context)
+
+
+class QuestionResultsViewTests(TestCase):
+    """Test the results view."""
+
+    def setUp(self):
+        """Start every test with an empty results cache."""
+        cache.clear()
+
+    def test_percentages_and_leader(self):
+        """Vote shares and the leading choice are computed for the page."""
+        question = create_question(question_text="Results", days=-1)
+        Choice.objects.create(question=question, choice_text="A", votes=3)
+        Choice.objects.create(question=question, choice_text="B", votes=1)
+        url = reverse("polls:results", args=(question.id,))
+        response = self.client.get(url)
+        results = response.context["results"]
+        self.assertEqual(results["total"], 4)
+        self.assertEqual([c["percent"] for c in results["choices"]],
+                         [75.0, 25.0])
+        self.assertEqual([c["text"] for c in results["leaders"]], ["A"])
+        self.assertContains(response, "75.0%")
+
+    def test_no_votes_has_no_leader(self):
+        """A question nobody voted on has no leading choice."""
+        question = create_question(question_text="Results", days=-1)
+        Choice.objects.create(question=question, choice_text="A")
+        url = reverse("polls:results", args=(question.id,))
+        results = self.client.get(url).context["results"]
+        self.assertEqual(results["leaders"], [])
+        self.assertEqual(results["choices"][0]["percent"], 0.0)
+
+    def test_constant_number_of_queries(self):
+        """The page costs the same queries however many choices it has."""
+        for num_choices in (2, 20):
+            question = create_question(question_text="Results", days=-1)
+            for n in range(num_choices):
+                Choice.objects.create(question=question,
+                                      choice_text=f"Choice {n}", votes=n)
+            url = reverse("polls:results", args=(question.id,))
+            with self.assertNumQueries(2):
+                self.client.get(url)
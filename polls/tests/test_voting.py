@@ -0,0 +1,136 @@
+"""Test casting and retracting votes."""
+from django.contrib.auth.models import User
+from unittest import mock, skipIf
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+
+from polls import user_votes
+from polls.models import Choice, Question, Vote
+from polls.stress import vote_burst
+from polls.voting import _retry, cast_vote, delete_votes, retract_vote
+
+
+class VotingTests(TestCase):
+    """Test the vote upsert and its counters."""
+
+    def setUp(self):
+        """Create a question with two choices and a voter."""
+        self.question = Question.objects.create(question_text="Vote")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        self.user = User.objects.create_user(username="voter")
+
+    def assertVotes(self, votes1, votes2):
+        """Check the vote counters of both choices."""
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes),
+                         (votes1, votes2))
+
+    def test_vote_takes_question_from_choice(self):
+        """A vote saved with only a choice knows its question."""
+        vote = Vote.objects.create(user=self.user, choice=self.choice1)
+        self.assertEqual(vote.question, self.question)
+
+    def test_database_rejects_second_vote(self):
+        """The database holds at most one vote per user and question."""
+        Vote.objects.create(user=self.user, choice=self.choice1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=self.user, choice=self.choice2)
+
+    def test_cast_and_change_vote(self):
+        """Changing a vote moves it between the choices' counters."""
+        self.assertIsNone(cast_vote(self.user, self.choice1))
+        self.assertVotes(1, 0)
+        self.assertEqual(cast_vote(self.user, self.choice2), self.choice1.id)
+        self.assertVotes(0, 1)
+        self.assertEqual(cast_vote(self.user, self.choice2), self.choice2.id)
+        self.assertVotes(0, 1)
+        self.assertEqual(Vote.objects.filter(user=self.user).count(), 1)
+
+    def test_retract_vote(self):
+        """Retracting a vote deletes it and takes it off the counter."""
+        cast_vote(self.user, self.choice1)
+        vote = retract_vote(self.user, self.question)
+        self.assertEqual(vote.choice, self.choice1)
+        self.assertVotes(0, 0)
+        with self.assertRaises(Vote.DoesNotExist):
+            retract_vote(self.user, self.question)
+
+    def test_delete_votes_in_chunks(self):
+        """Votes are deleted a chunk at a time, keeping the counters right."""
+        for n in range(5):
+            voter = User.objects.create_user(username=f"voter{n}")
+            cast_vote(voter, self.choice2 if n % 2 else self.choice1)
+        cast_vote(self.user, self.choice1)
+        votes = Vote.objects.exclude(user=self.user)
+        # Per chunk: read, savepoint, delete, recount and release.
+        with self.assertNumQueries(3 * 5 + 1):
+            self.assertEqual(delete_votes(votes, chunk_size=2), 5)
+        self.assertVotes(1, 0)
+
+    def test_retry_unique_conflicts_only(self):
+        """A lost insert race is retried; other integrity errors aren't."""
+        calls = []
+
+        def insert_twice():
+            calls.append(None)
+            if len(calls) == 1:
+                Vote.objects.create(user=self.user, choice=self.choice1)
+            return Vote.objects.create(user=self.user, choice=self.choice1)
+
+        _retry(insert_twice)
+        self.assertEqual(len(calls), 2)
+
+        def broken():
+            calls.append(None)
+            raise IntegrityError("FOREIGN KEY constraint failed")
+
+        calls.clear()
+        with self.assertRaises(IntegrityError):
+            _retry(broken)
+        self.assertEqual(len(calls), 1)
+
+    def test_vote_map_read_during_vote(self):
+        """A vote map loaded before a vote isn't served after it."""
+        cache.clear()
+        load = user_votes._load
+
+        def load_then_vote(user, vote_buffer):
+            votes = load(user, vote_buffer)
+            cast_vote(self.user, self.choice1)
+            return votes
+
+        with mock.patch("polls.user_votes._load", load_then_vote):
+            self.assertEqual(user_votes.vote_map(self.user), {})
+        self.assertEqual(user_votes.vote_map(self.user),
+                         {self.question.id: self.choice1.id})
+        retract_vote(self.user, self.question)
+        self.assertEqual(user_votes.vote_map(self.user), {})
+
+
+@skipIf(connection.vendor == "sqlite",
+        "SQLite locks whole tables, so concurrent writers fail fast.")
+class ConcurrentVotingTests(TransactionTestCase):
+    """Test the vote path under simultaneous votes."""
+
+    def test_one_vote_per_user_under_burst(self):
+        """Racing submissions leave one vote per user and exact counters."""
+        question = Question.objects.create(question_text="Burst")
+        choices = [Choice.objects.create(question=question,
+                                         choice_text=f"Choice {n}")
+                   for n in range(3)]
+        users = [User.objects.create_user(username=f"voter{n}")
+                 for n in range(40)]
+
+        stats = vote_burst(users, choices, submissions=3, workers=8)
+
+        self.assertEqual(stats["errors"], [])
+        for user in users:
+            self.assertEqual(Vote.objects.filter(user=user).count(), 1)
+        self.assertEqual(sum(Choice.objects.values_list("votes", flat=True)),
+                         len(users))
+        self.assertEqual(question.choice_set.reconcile_votes(), 0)
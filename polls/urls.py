@@ -9,4 +9,8 @@ urlpatterns = [
     path("<int:pk>/results/", views.ResultsView.as_view(), name="results"),
     path("<int:question_id>/vote/", views.vote, name="vote"),
     path("<int:question_id>/unvote/", views.unvote, name="unvote"),
+    path("<int:question_id>/export/", views.export_poll, name="export"),
+    path("import/", views.import_votes, name="import"),
+    path("stats/", views.stats, name="stats"),
+    path("metrics/", views.metrics, name="metrics"),
 ]
\ No newline at end of file
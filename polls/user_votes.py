@@ -0,0 +1,110 @@
+"""Cache each user's votes as a map of question ids to choice ids.
+
+The map is loaded with one query and kept in the cache, so pages can
+mark the choices a user voted for without querying the Vote table. Maps
+are stored under a version per user, which every committed or queued
+vote change replaces, rather than being edited in place: a map read
+before a vote can then only be stored under the old version, where no
+one looks for it any more.
+"""
+
+import time
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from .models import Vote
+
+# How long a user's vote map may stay in the cache, in seconds.
+USER_VOTES_TIMEOUT = 60 * 60
+
+
+def _version_key(user_id):
+    return f"polls:user_votes:version:{user_id}"
+
+
+def _key(user_id, version):
+    return f"polls:user_votes:{user_id}:{version}"
+
+
+def get_version(user_id):
+    """Return the current version of a user's vote map.
+
+    A version that was dropped or evicted from the cache is replaced by
+    a fresh, time-based one, so it can never match an older map.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(user_id):
+    """Return `get_version(user_id)`, using the async cache API."""
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def _load(user, vote_buffer):
+    votes = dict(Vote.objects.filter(user=user)
+                 .values_list("question_id", "choice_id"))
+    if vote_buffer:
+        _overlay(votes, vote_buffer.pending(user.id))
+    return votes
+
+
+def _overlay(votes, pending):
+    """Apply a user's unflushed intents to their vote map."""
+    for question_id, choice_id in pending.items():
+        if choice_id is None:
+            votes.pop(question_id, None)
+        else:
+            votes[question_id] = choice_id
+
+
+def vote_map(user, vote_buffer=None):
+    """Return the user's votes, as a dict of question id to choice id.
+
+    Args:
+        user: the user, who may be anonymous
+        vote_buffer: the vote buffer in use, if any, whose unflushed
+            intents are applied when the map is loaded from the database
+    """
+    if not user.is_authenticated:
+        return {}
+    key = _key(user.id, get_version(user.id))
+    votes = cache.get(key)
+    if votes is None:
+        votes = _load(user, vote_buffer)
+        cache.set(key, votes, timeout=USER_VOTES_TIMEOUT)
+    return votes
+
+
+async def avote_map(user, vote_buffer=None):
+    """Return `vote_map(user, vote_buffer)`, querying asynchronously."""
+    if not user.is_authenticated:
+        return {}
+    key = _key(user.id, await aget_version(user.id))
+    votes = await cache.aget(key)
+    if votes is None:
+        votes = {question_id: choice_id async for question_id, choice_id
+                 in Vote.objects.filter(user=user)
+                 .values_list("question_id", "choice_id")}
+        if vote_buffer:
+            _overlay(votes, await sync_to_async(vote_buffer.pending)(user.id))
+        await cache.aset(key, votes, timeout=USER_VOTES_TIMEOUT)
+    return votes
+
+
+def forget(user_ids):
+    """Invalidate the cached vote maps of some users.
+
+    Call this once their vote changes are committed or queued. Their
+    versions are dropped, so the maps are loaded again when next needed.
+    """
+    cache.delete_many([_version_key(user_id) for user_id in user_ids])
@@ -1,18 +1,33 @@
 """Contains the views of the poll application."""
 
+import datetime
+import functools
 import logging
-from django.http import HttpResponseRedirect
+from django.db.models import Q
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, \
+                        HttpResponseRedirect, JsonResponse, \
+                        StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
-from django.utils import timezone
 from django.views import generic
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import user_logged_in, \
                                 user_login_failed, \
                                 user_logged_out
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.dispatch import receiver
+from . import export, lifecycle, page_cache, user_votes
+from .buffer import get_buffer
+from .instrumentation import registry
+from .logging_pipeline import pipeline_stats
+from .ratelimit import get_client_ip, login_stats, rate_limit_stats, \
+    rate_limited
+from .importer import VoteImporter, parse_ballots
 from .models import Choice, Question, Vote
+from .results import cache_stats, cached_tally
+from .voting import cast_vote, retract_vote
 
 logger = logging.getLogger("polls")
 
@@ -22,11 +37,67 @@ class IndexView(generic.ListView):
 
     template_name = "polls/index.html"
     context_object_name = "latest_question_list"
+    page_size = 10
+
+    def get(self, request, *args, **kwargs):
+        """Serve anonymous visitors the cached page, if there is one."""
+        lifecycle.tick()
+        self.page_key = page_cache.index_key(request.GET.get("before"))
+        if page_cache.cacheable(request):
+            return page_cache.serve(request, self.page_key, functools.partial(
+                super().get, request, *args, **kwargs))
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        """Return the last five published questions."""
-        questions = Question.objects.filter(pub_date__lte=timezone.now())
-        return questions.order_by("-pub_date")
+        """Return a page of published questions, the newest first.
+
+        Pages are keyset paginated on (pub_date, id): the `before` query
+        parameter holds the cursor of the last question of the previous
+        page, so every page costs the same however deep it is.
+        """
+        questions = Question.objects.published()
+        cursor = self.request.GET.get("before")
+        if cursor:
+            pub_date, pk = parse_cursor(cursor)
+            questions = questions.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+        page = list(questions[:self.page_size + 1])
+        self.next_cursor = None
+        if len(page) > self.page_size:
+            self.next_cursor = make_cursor(page[self.page_size - 1])
+        return page[:self.page_size]
+
+    def get_context_data(self, **kwargs):
+        """Add the cursor of the next page to the context.
+
+        The questions the user voted on are marked as `voted`.
+        """
+        data = super().get_context_data(**kwargs)
+        votes = user_votes.vote_map(self.request.user, get_buffer())
+        voted = []
+        for question in data["latest_question_list"]:
+            question.voted = question.id in votes
+            if question.voted:
+                voted.append(str(question.id))
+        data["fragment_key"] = f"{self.page_key}:{','.join(voted)}"
+        data["next_cursor"] = self.next_cursor
+        data["is_first_page"] = "before" not in self.request.GET
+        return data
+
+
+def make_cursor(question):
+    """Return the pagination cursor that points after a question."""
+    return f"{question.pub_date.isoformat()}|{question.pk}"
+
+
+def parse_cursor(cursor):
+    """Split a pagination cursor into its publication date and id."""
+    try:
+        pub_date, pk = cursor.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(pub_date), int(pk)
+    except ValueError:
+        raise Http404("Invalid page cursor.")
 
 
 class DetailView(generic.DetailView):
@@ -35,27 +106,36 @@ class DetailView(generic.DetailView):
     model = Question
     template_name = "polls/detail.html"
 
-    def dispatch(self, request, *args, **kwargs):
+    def get_queryset(self):
+        """Load the question with its choices prefetched.
+
+        The user's vote comes from their cached vote map, so the page
+        costs two queries.
+        """
+        return Question.objects.prefetch_related("choice_set")
+
+    def get(self, request, *args, **kwargs):
         """Check whether the question can be voted on.
 
         If not, then redirects to the index page with error message.
         """
-        question = self.get_object()
-        if not question.can_vote():
+        lifecycle.tick()
+        self.object = self.get_object()
+        if self.object.status != Question.Status.OPEN:
             error_text = "Access Denied."
             messages.error(request, error_text)
             return HttpResponseRedirect(reverse("polls:index"))
-        return super().dispatch(request, *args, **kwargs)
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
 
     def get_context_data(self, **kwargs):
         """Add user's selected choice to the context, if exists."""
         data = super().get_context_data(**kwargs)
-        question = self.get_object()
-        user = self.request.user
-        if user.is_authenticated:
-            marked_vote = user.vote_set.filter(choice__question=question)
-            if marked_vote:
-                data["marked_choice"] = marked_vote.first().choice
+        votes = user_votes.vote_map(self.request.user, get_buffer())
+        marked_choice_id = votes.get(self.object.id)
+        for choice in self.object.choice_set.all():
+            if choice.id == marked_choice_id:
+                data["marked_choice"] = choice
         return data
 
 
@@ -65,7 +145,23 @@ class ResultsView(generic.DetailView):
     model = Question
     template_name = "polls/results.html"
 
+    def get(self, request, *args, **kwargs):
+        """Serve anonymous visitors the cached page, if there is one."""
+        self.page_key = page_cache.results_key(kwargs["pk"])
+        if page_cache.cacheable(request):
+            return page_cache.serve(request, self.page_key, functools.partial(
+                super().get, request, *args, **kwargs))
+        return super().get(request, *args, **kwargs)
 
+    def get_context_data(self, **kwargs):
+        """Add the vote totals of the question's choices to the context."""
+        data = super().get_context_data(**kwargs)
+        data["results"] = cached_tally(self.object.pk)
+        data["fragment_key"] = self.page_key
+        return data
+
+
+@rate_limited("polls:vote")
 @login_required
 def vote(request, question_id):
     """If the user is eligible to vote, cast a vote to the active question."""
@@ -83,23 +179,27 @@ def vote(request, question_id):
                                             args=(question.id,)))
 
     this_user = request.user
-    try:
-        vote = this_user.vote_set.get(choice__question=question,
-                                      user=this_user)
-        vote.choice = selected_choice
-        vote.save()
+    vote_buffer = get_buffer()
+    if vote_buffer:
+        previous = vote_buffer.cast(this_user, selected_choice)
+    else:
+        previous = cast_vote(this_user, selected_choice)
+    if previous is not None:
         vote_id = selected_choice.id
         logger.info(
             f"{this_user} changed vote to vote id: {vote_id} \
-on question id: {question.id}"
+on question id: {question.id}",
+            extra={"event": "vote", "user": this_user.pk,
+                   "question": question.id, "choice": selected_choice.id},
         )
         messages.success(request, f'Your vote was changed to \
 "{selected_choice.choice_text}"')
-    except Vote.DoesNotExist:
-        vote = Vote.objects.create(user=this_user, choice=selected_choice)
+    else:
         logger.info(
             f"{this_user} voted vote id: {selected_choice.id} \
-on question id: {question.id}"
+on question id: {question.id}",
+            extra={"event": "vote", "user": this_user.pk,
+                   "question": question.id, "choice": selected_choice.id},
         )
         messages.success(request, f'You have voted \
 "{selected_choice.choice_text}"')
@@ -107,18 +207,27 @@ on question id: {question.id}"
     return HttpResponseRedirect(reverse("polls:results", args=(question.id,)))
 
 
+@rate_limited("polls:unvote")
 @login_required
 def unvote(request, question_id):
     """Delete the user's vote, if exists."""
     question = get_object_or_404(Question, pk=question_id)
     this_user = request.user
 
+    vote_buffer = get_buffer()
     try:
-        vote = this_user.vote_set.get(choice__question=question,
-                                      user=this_user)
-        logger.info(f"{this_user} deleted vote id: {vote.id} \
-on question id: {question.id}")
-        vote.delete()
+        if vote_buffer:
+            vote_buffer.retract(this_user, question)
+            logger.info(f"{this_user} queued deleting vote \
+on question id: {question.id}",
+                        extra={"event": "unvote", "user": this_user.pk,
+                               "question": question.id})
+        else:
+            vote = retract_vote(this_user, question)
+            logger.info(f"{this_user} deleted vote id: {vote.id} \
+on question id: {question.id}",
+                        extra={"event": "unvote", "user": this_user.pk,
+                               "question": question.id})
         messages.success(request, "You've successfully deleted your vote")
     except Vote.DoesNotExist:
         messages.error(request, "ERROR: You haven't vote yet")
@@ -133,35 +242,112 @@ on question id: {question.id}"
                                         args=(question.id,)))
 
 
-def get_client_ip(request):
-    """Get the visitor’s IP address using request headers."""
-    if request:
-        x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(",")[0]
-        else:
-            ip = request.META.get("REMOTE_ADDR")
-        return ip
-    return None
+@staff_member_required
+def stats(request):
+    """Show the runtime statistics of the poll application."""
+    data = {"results_cache": cache_stats(),
+            "page_cache": page_cache.page_stats(),
+            "views": registry.snapshot(), "logging": pipeline_stats(),
+            "logins": login_stats(), "rate_limits": rate_limit_stats()}
+    vote_buffer = get_buffer()
+    if vote_buffer:
+        data["vote_buffer"] = {**vote_buffer.stats(),
+                               "backlog": vote_buffer.backlog()}
+    return JsonResponse(data)
+
+
+@staff_member_required
+def metrics(request):
+    """Dump the per-view request histograms for Prometheus."""
+    return HttpResponse(registry.prometheus(),
+                        content_type="text/plain; version=0.0.4")
+
+
+@staff_member_required
+def export_poll(request, question_id):
+    """Stream a question's results or raw votes as CSV or NDJSON.
+
+    The `kind` query parameter is "results" (default) or "votes", and
+    `format` is "csv" (default) or "ndjson".
+    """
+    question = get_object_or_404(Question, pk=question_id)
+    kind = request.GET.get("kind", "results")
+    fmt = request.GET.get("format", "csv")
+    try:
+        lines = export.export(question, kind, fmt)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(lines,
+                                     content_type=export.FORMATS[fmt])
+    response["Content-Disposition"] = (
+        f'attachment; filename="question-{question.id}-{kind}.{fmt}"'
+    )
+    return response
+
+
+@staff_member_required
+@require_POST
+def import_votes(request):
+    """Import a CSV or NDJSON stream of (username, question_id, choice_id).
+
+    The `format` query parameter is "csv" (default, with a header) or
+    "ndjson". Responds with the number of imported votes and the
+    rejected lines.
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return HttpResponseBadRequest(f"Can't import {fmt!r}.")
+    read = []
+
+    def lines():
+        for line in request:
+            read.append(None)
+            yield line.decode("utf-8")
+
+    importer = VoteImporter()
+    try:
+        importer.run(parse_ballots(lines(), fmt))
+    except UnicodeDecodeError:
+        logger.warning(f"{request.user} posted votes that aren't UTF-8, \
+stopped at line {len(read)}")
+        return HttpResponseBadRequest(
+            f"Line {len(read)} isn't UTF-8 text. The import stopped there, "
+            f"after importing {importer.imported} votes.")
+    logger.info(f"{request.user} imported {importer.imported} votes, \
+rejected {len(importer.rejected)}")
+    return JsonResponse({
+        "imported": importer.imported,
+        "rejected": [{"line": number, "reason": reason}
+                     for number, reason in importer.rejected],
+    })
 
 
 @receiver(user_logged_in)
 def login_success(sender, request, user, **kwargs):
     """Log when user successfully login."""
     ip_addr = get_client_ip(request)
-    logger.info(f"{user.username} logged in from {ip_addr}")
+    logger.info(f"{user.username} logged in from {ip_addr}",
+                extra={"event": "login", "user": user.pk, "ip": ip_addr})
 
 
 @receiver(user_logged_out)
 def logout_success(sender, request, user, **kwargs):
     """Log when user successfully log out."""
     ip_addr = get_client_ip(request)
-    logger.info(f"{user.username} logged out from {ip_addr}")
+    logger.info(f"{user.username} logged out from {ip_addr}",
+                extra={"event": "logout", "user": user.pk, "ip": ip_addr})
 
 
 @receiver(user_login_failed)
 def login_fail(sender, credentials, request, **kwargs):
     """Log when user failed to login."""
     ip_addr = get_client_ip(request)
+    if getattr(request, "login_throttled", False):
+        logger.warning(f"Refused login for {credentials['username']} \
+from {ip_addr}: too many failures", extra={
+            "event": "login_throttled",
+            "username": credentials["username"], "ip": ip_addr})
+        return
     logger.warning(f"Failed login for {credentials['username']} \
-from {ip_addr}")
+from {ip_addr}", extra={"event": "login_failed",
+                        "username": credentials["username"], "ip": ip_addr})
@@ -0,0 +1,188 @@
+"""Cast and retract votes, keeping the vote counters in step.
+
+The write paths take no row locks up front. Each step is a single
+statement whose WHERE clause checks what was read before it (a
+compare-and-swap), and the unique (user, question) constraint rejects
+a second insert. When a concurrent request wins the race, the whole
+transaction is rolled back and retried.
+"""
+
+import random
+import sqlite3
+import time
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F, Q
+
+from .models import Choice, Vote
+from .results import bump_version
+from .user_votes import forget
+
+# How many times a vote is attempted before giving up.
+MAX_ATTEMPTS = 10
+
+
+class _Conflict(Exception):
+    """The user's vote changed between reading and writing it."""
+
+
+def _lost_race(error):
+    """Tell whether an error is a race a retry may win.
+
+    Of the integrity errors, only a unique constraint conflict is: the
+    other request inserted the same vote first. Anything else, such as
+    a choice or user that no longer exists, fails every time.
+    """
+    if not isinstance(error, IntegrityError):
+        return True
+    cause = error.__cause__
+    sqlstate = getattr(cause, "sqlstate", None) \
+        or getattr(cause, "pgcode", None)
+    if sqlstate is not None:
+        return sqlstate == "23505"
+    # SQLite
+    return getattr(cause, "sqlite_errorcode", None) in (
+        sqlite3.SQLITE_CONSTRAINT_UNIQUE, sqlite3.SQLITE_CONSTRAINT_PRIMARYKEY)
+
+
+def _retry(write):
+    """Run `write` in a transaction, retrying it when it loses a race."""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return write()
+        except (_Conflict, IntegrityError, OperationalError) as error:
+            if attempt == MAX_ATTEMPTS - 1 or not _lost_race(error):
+                raise
+            # Back off a little, so the racing requests spread out.
+            time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+
+
+def _add_votes(deltas):
+    """Apply vote counter changes, in primary key order to avoid deadlocks.
+
+    Args:
+        deltas: pairs of (choice id, change in votes)
+    """
+    for choice_id, delta in sorted(deltas):
+        Choice.objects.filter(pk=choice_id).update(votes=F("votes") + delta)
+
+
+def cast_vote(user, choice):
+    """Record the user's vote for a choice.
+
+    Returns:
+        the id of the choice the user voted for before, or None if this
+        is the user's first vote on the question.
+    """
+    def write():
+        mine = Vote.objects.filter(user=user, question_id=choice.question_id)
+        previous = mine.values_list("choice_id", flat=True).first()
+        if previous is None:
+            Vote.objects.create(user=user, question_id=choice.question_id,
+                                choice=choice)
+            _add_votes([(choice.id, 1)])
+        elif previous != choice.id:
+            if not mine.filter(choice_id=previous).update(choice=choice):
+                raise _Conflict
+            _add_votes([(previous, -1), (choice.id, 1)])
+        return previous
+
+    previous = _retry(write)
+    if previous != choice.id:
+        bump_version(choice.question_id)
+        forget([user.id])
+    return previous
+
+
+def retract_vote(user, question):
+    """Delete the user's vote on a question.
+
+    Returns:
+        the deleted vote.
+
+    Raises:
+        Vote.DoesNotExist: if the user hasn't voted on the question.
+    """
+    def write():
+        mine = Vote.objects.filter(user=user, question=question)
+        found = mine.values_list("pk", "choice_id").first()
+        if found is None:
+            raise Vote.DoesNotExist("The user hasn't voted on this question.")
+        pk, choice_id = found
+        if not Vote.objects.filter(pk=pk, choice_id=choice_id).delete()[0]:
+            raise _Conflict
+        _add_votes([(choice_id, -1)])
+        return Vote(pk=pk, user=user, question=question, choice_id=choice_id)
+
+    vote = _retry(write)
+    bump_version(question.id)
+    forget([user.id])
+    return vote
+
+
+def apply_votes(ballots, retractions=()):
+    """Write many users' votes at once, in one transaction.
+
+    Args:
+        ballots: a dict mapping (user id, question id) to the chosen
+            choice id; existing votes on those questions are replaced
+        retractions: (user id, question id) pairs whose votes are deleted
+    """
+    pairs = set(ballots) | set(retractions)
+    if not pairs:
+        return
+    users = {user for user, _ in pairs}
+    questions = {question for _, question in pairs}
+    with transaction.atomic():
+        affected = set(ballots.values())
+        affected.update(Vote.objects.filter(
+            user_id__in=users, question_id__in=questions,
+        ).values_list("choice_id", flat=True))
+        Vote.objects.bulk_create(
+            [Vote(user_id=user, question_id=question, choice_id=choice)
+             for (user, question), choice in ballots.items()],
+            update_conflicts=True,
+            unique_fields=["user", "question"],
+            update_fields=["choice"],
+        )
+        if retractions:
+            retracted = Q()
+            for user, question in retractions:
+                retracted |= Q(user_id=user, question_id=question)
+            Vote.objects.filter(retracted).delete()
+        Choice.objects.filter(pk__in=affected).reconcile_votes()
+    for question_id in questions:
+        bump_version(question_id)
+    forget(users)
+
+
+def delete_votes(votes, chunk_size=1000):
+    """Delete a queryset of votes, however many, in chunks.
+
+    Each chunk is deleted by primary key in its own transaction, and
+    only the choices it touched are recounted.
+
+    Returns:
+        the number of votes deleted.
+    """
+    deleted = 0
+    last = 0
+    questions, users = set(), set()
+    while True:
+        chunk = list(votes.filter(pk__gt=last).order_by("pk").values_list(
+            "pk", "user_id", "question_id", "choice_id")[:chunk_size])
+        if not chunk:
+            break
+        last = chunk[-1][0]
+        with transaction.atomic():
+            deleted += Vote.objects.filter(
+                pk__in=[pk for pk, _, _, _ in chunk]).delete()[0]
+            Choice.objects.filter(
+                pk__in={choice for _, _, _, choice in chunk}
+            ).reconcile_votes()
+        users.update(user for _, user, _, _ in chunk)
+        questions.update(question for _, _, question, _ in chunk)
+    for question_id in questions:
+        bump_version(question_id)
+    forget(users)
+    return deleted